@@ -1,20 +1,38 @@
-"""Anomaly detection using Isolation Forest on unit telemetry features."""
+"""Anomaly detection using Isolation Forest on unit telemetry features.
+
+NumPy, scikit-learn and SciPy's k-d tree are imported lazily (see
+``AnomalyEngine.warm_up``) so importing the app does not pay for the ML stack.
+"""
 
 from __future__ import annotations
 
 import math
+import statistics
 from collections import defaultdict, deque
-from typing import Dict, List, Optional
-
-import numpy as np
-from sklearn.ensemble import IsolationForest
+from types import ModuleType
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
 
 from .models import UnitRuntimeState
 
+if TYPE_CHECKING:
+    from sklearn.ensemble import IsolationForest
+
 # Minimum samples before the model will train
 MIN_BASELINE_SAMPLES = 30
 # Maximum history length per unit (sliding window)
 MAX_HISTORY = 200
+# Nearest-unit distance feature is capped at this many metres
+NEAREST_UNIT_CAP_M = 5000.0
+EARTH_RADIUS_M = 6_371_000
+
+
+def _load_ml() -> Tuple[ModuleType, type, type]:
+    """Import the ML stack; the first call costs about a second."""
+    import numpy as np
+    from scipy.spatial import cKDTree
+    from sklearn.ensemble import IsolationForest
+
+    return np, IsolationForest, cKDTree
 
 
 class AnomalyEngine:
@@ -24,6 +42,8 @@ class AnomalyEngine:
         self._baseline_samples: List[List[float]] = []
         self._is_trained: bool = False
         self._model: Optional[IsolationForest] = None
+        # (numpy, IsolationForest, cKDTree) once the ML stack has been imported
+        self._ml: Optional[Tuple[ModuleType, type, type]] = None
         # Per-unit history for computing acceleration & continuity
         self._history: Dict[str, deque] = defaultdict(lambda: deque(maxlen=MAX_HISTORY))
         # Cache of all current unit positions for inter-unit distance
@@ -33,9 +53,12 @@ class AnomalyEngine:
     # Feature extraction
     # ------------------------------------------------------------------
 
-    def _extract_features(self, state: UnitRuntimeState) -> List[float]:
+    def _extract_features(self, state: UnitRuntimeState, nearest_m: Optional[float] = None) -> List[float]:
         """Build a feature vector from the current unit state and its history.
 
+        *nearest_m* is the precomputed distance to the nearest other unit;
+        without it the known positions are scanned.
+
         Features:
             0  speed_mps
             1  acceleration (delta speed over last 2 samples)
@@ -51,19 +74,13 @@ class AnomalyEngine:
         acceleration = speed - prev_speed
 
         # --- distance to nearest unit ---
-        min_dist = 5000.0
-        for uid, (lat, lon) in self._latest_positions.items():
-            if uid == state.unit_id:
-                continue
-            d = self._haversine(state.lat, state.lon, lat, lon)
-            if d < min_dist:
-                min_dist = d
+        min_dist = nearest_m if nearest_m is not None else self._nearest_distance(state)
 
         # --- heading continuity (std of recent direction deltas) ---
         headings = [h[1] for h in (history or [])][-10:]
         if len(headings) >= 2:
             deltas = [abs(headings[i] - headings[i - 1]) for i in range(1, len(headings))]
-            continuity = float(np.std(deltas)) if deltas else 0.0
+            continuity = statistics.pstdev(deltas) if deltas else 0.0
         else:
             continuity = 0.0
 
@@ -82,6 +99,15 @@ class AnomalyEngine:
     # Public API
     # ------------------------------------------------------------------
 
+    def warm_up(self) -> None:
+        """Import the ML stack; safe to run in a worker thread at startup.
+
+        Until it finishes, scoring keeps collecting baseline samples and
+        returns 0, exactly as before the model is trained.
+        """
+        if self._ml is None:
+            self._ml = _load_ml()
+
     def record_baseline(self, state: UnitRuntimeState) -> None:
         """Record a telemetry snapshot for baseline training."""
         self._latest_positions[state.unit_id] = (state.lat, state.lon)
@@ -89,14 +115,16 @@ class AnomalyEngine:
         self._baseline_samples.append(features)
         self._history[state.unit_id].append((state.speed_mps, state.direction_deg))
 
-        # Auto-train once enough samples collected
-        if not self._is_trained and len(self._baseline_samples) >= MIN_BASELINE_SAMPLES:
+        # Auto-train once enough samples collected and the ML stack is loaded
+        if not self._is_trained and self._ml is not None and len(self._baseline_samples) >= MIN_BASELINE_SAMPLES:
             self.train()
 
     def train(self) -> None:
         """Fit the Isolation Forest on collected baseline samples."""
         if len(self._baseline_samples) < MIN_BASELINE_SAMPLES:
             return
+        self.warm_up()
+        np, IsolationForest, _ = self._ml
         X = np.array(self._baseline_samples)
         self._model = IsolationForest(
             n_estimators=100,
@@ -119,23 +147,94 @@ class AnomalyEngine:
         if not self._is_trained or self._model is None:
             # Still collecting baseline – record it passively
             self._baseline_samples.append(features)
-            if len(self._baseline_samples) >= MIN_BASELINE_SAMPLES:
+            if self._ml is not None and len(self._baseline_samples) >= MIN_BASELINE_SAMPLES:
                 self.train()
             return 0.0
 
+        np, _, _ = self._ml
         raw = self._model.decision_function(np.array([features]))[0]
         # decision_function returns negative for outliers; normalise to [0, 1]
         score = max(0.0, min(1.0, 0.5 - raw))
         return round(score, 4)
 
+    def score_units(self, states: Sequence[UnitRuntimeState]) -> List[float]:
+        """Score a batch of units; the batch form of ``score_unit``.
+
+        Every position in the batch is recorded before features are built, so
+        nearest-unit distances all see this tick's positions.  Distances come
+        from one k-d tree query and the model is called once for the batch.
+        """
+        for state in states:
+            self._latest_positions[state.unit_id] = (state.lat, state.lon)
+        nearest = self._nearest_distances(states)
+        features = [self._extract_features(state, distance) for state, distance in zip(states, nearest)]
+        for state in states:
+            self._history[state.unit_id].append((state.speed_mps, state.direction_deg))
+
+        if not self._is_trained or self._model is None:
+            self._baseline_samples.extend(features)
+            if self._ml is not None and len(self._baseline_samples) >= MIN_BASELINE_SAMPLES:
+                self.train()
+            return [0.0] * len(states)
+
+        np, _, _ = self._ml
+        raw = self._model.decision_function(np.array(features))
+        return [round(max(0.0, min(1.0, 0.5 - r)), 4) for r in raw.tolist()]
+
+    def forget_unit(self, unit_id: str) -> None:
+        """Drop per-unit history for a unit that left the fleet."""
+        self._history.pop(unit_id, None)
+        self._latest_positions.pop(unit_id, None)
+
     @property
     def is_trained(self) -> bool:
         return self._is_trained
 
+    @property
+    def is_loaded(self) -> bool:
+        return self._ml is not None
+
     # ------------------------------------------------------------------
     # Helpers
     # ------------------------------------------------------------------
 
+    def _nearest_distance(self, state: UnitRuntimeState) -> float:
+        min_dist = NEAREST_UNIT_CAP_M
+        for uid, (lat, lon) in self._latest_positions.items():
+            if uid == state.unit_id:
+                continue
+            d = self._haversine(state.lat, state.lon, lat, lon)
+            if d < min_dist:
+                min_dist = d
+        return min_dist
+
+    def _nearest_distances(self, states: Sequence[UnitRuntimeState]) -> List[Optional[float]]:
+        """Nearest-unit distance for each of *states*, via one k-d tree query.
+
+        Positions are projected onto a local planar frame to find the nearest
+        unit, whose great-circle distance is then reported.  Before the ML
+        stack is loaded this returns None for each unit (scan per unit).
+        """
+        if self._ml is None or not states:
+            return [None] * len(states)
+        np, _, cKDTree = self._ml
+        index = {uid: k for k, uid in enumerate(self._latest_positions)}
+        coords = np.radians(np.array(list(self._latest_positions.values()), dtype=float))
+        lat, lon = coords[:, 0], coords[:, 1]
+        lon_ref = float(np.median(lon))
+        points = np.column_stack(((lon - lon_ref) * np.cos(lat), lat)) * EARTH_RADIUS_M
+
+        rows = np.array([index[state.unit_id] for state in states])
+        _, found = cKDTree(points).query(points[rows], k=2, distance_upper_bound=NEAREST_UNIT_CAP_M)
+        # The closest hit is normally the unit itself, unless another shares its spot
+        other = np.where(found[:, 0] == rows, found[:, 1], found[:, 0])
+        hit = other < len(points)
+        nearest = np.full(len(rows), NEAREST_UNIT_CAP_M)
+        a, b = coords[rows[hit]], coords[other[hit]]
+        h = np.sin((b[:, 0] - a[:, 0]) / 2) ** 2 + np.cos(a[:, 0]) * np.cos(b[:, 0]) * np.sin((b[:, 1] - a[:, 1]) / 2) ** 2
+        nearest[hit] = np.minimum(EARTH_RADIUS_M * 2 * np.arctan2(np.sqrt(h), np.sqrt(1 - h)), NEAREST_UNIT_CAP_M)
+        return nearest.tolist()
+
     @staticmethod
     def _haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """Return distance in metres between two lat/lon points."""
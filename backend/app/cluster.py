@@ -0,0 +1,628 @@
+"""Multi-worker deployment: one primary owns the state, replicas mirror it.
+
+When ``CLUSTER_DIR`` is set, every uvicorn worker races for a lock file in
+that directory at startup.  The winner becomes the *primary*: it runs the
+movement engine and the authoritative ``StateManager`` exactly as a single
+process would.  Every other worker becomes a *replica*:
+
+* reads (``GET /api/units``, ``/api/health``, ``/api/alerts``,
+  ``/api/fleet/export`` and WebSocket ``state_init``) are served from a
+  shared-memory mirror of the primary's serialized public state;
+* writes (any non-GET request) are forwarded verbatim to the primary;
+* broadcasts reach the replica's own WebSocket clients over a Unix-socket
+  pub/sub channel, carrying everything but the unit list, which replicas
+  read from the mirror instead;
+* active alerts and ML status are sent to a replica when it connects and
+  again whenever they change, broadcast or not.
+
+The mirror is a memory-mapped file guarded by a sequence lock: the primary
+makes the sequence odd, writes, then makes it even again, and a reader
+retries until it copies the body under one unchanged, even sequence.  The
+file is replaced (never resized in place) when the fleet outgrows it.
+Failover is not handled: if the primary exits, replicas keep serving the
+last mirrored state and answer writes with 503.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import itertools
+import json
+import logging
+import mmap
+import os
+import struct
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .models import AlertPayload, utc_now
+from .state_manager import PublicStateCache, PublicUnitList, StateManager
+from .websocket_manager import WebsocketManager
+
+logger = logging.getLogger(__name__)
+
+# seq, version, body length, unit count, etag
+MIRROR_HEADER = struct.Struct("<QQQQ64s")
+MIRROR_SEQ = struct.Struct("<Q")
+# Smallest mirror body allocated; it doubles past the current body when outgrown
+MIRROR_MIN_CAPACITY = 1 << 20
+# Attempts to copy a consistent body before falling back to the last snapshot
+MIRROR_READ_ATTEMPTS = 1000
+# Channel frames: metadata length, body length, then JSON metadata and raw body
+FRAME_HEADER = struct.Struct("<II")
+# Seconds a replica waits for the primary to answer a forwarded request
+FORWARD_TIMEOUT_S = 30.0
+# Seconds between a replica's attempts to reach the primary's channel
+RECONNECT_DELAY_S = 0.2
+# Methods a replica answers itself; everything else is forwarded
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# Seconds between the primary's checks for alert / ML status changes that no
+# broadcast carried (model warm-up, alerts dropped with a removed unit)
+ENGINE_SYNC_INTERVAL_S = 1.0
+
+
+# ----------------------------------------------------------------------
+# Shared-memory state mirror
+# ----------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class MirrorSnapshot:
+    version: int
+    count: int
+    etag: str
+    body: bytes
+
+
+class StateMirrorWriter:
+    """Publishes the primary's serialized public state into the mirror file."""
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._mm: Optional[mmap.mmap] = None
+        self._capacity = 0
+        self._seq = 0
+        self._version: Optional[int] = None
+
+    def publish(self, cache: PublicStateCache) -> None:
+        if cache.version == self._version:
+            return
+        if self._mm is None or len(cache.body) > self._capacity:
+            self._replace(cache, max(MIRROR_MIN_CAPACITY, 2 * len(cache.body)))
+        else:
+            self._seq = self._write(self._mm, self._seq, cache)
+        self._version = cache.version
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def _replace(self, cache: PublicStateCache, capacity: int) -> None:
+        # Fill the new file completely before swapping it in, so a reader that
+        # maps it straight away never sees an empty fleet
+        tmp_path = f"{self._path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w+b") as handle:
+            handle.truncate(MIRROR_HEADER.size + capacity)
+            mm = mmap.mmap(handle.fileno(), 0)
+        self._seq = self._write(mm, 0, cache)
+        os.replace(tmp_path, self._path)
+        self.close()
+        self._mm = mm
+        self._capacity = capacity
+
+    @staticmethod
+    def _write(mm: mmap.mmap, seq: int, cache: PublicStateCache) -> int:
+        body = cache.body
+        MIRROR_SEQ.pack_into(mm, 0, seq + 1)
+        mm[MIRROR_HEADER.size : MIRROR_HEADER.size + len(body)] = body
+        MIRROR_HEADER.pack_into(mm, 0, seq + 1, cache.version, len(body), len(cache.units), cache.etag.encode())
+        MIRROR_SEQ.pack_into(mm, 0, seq + 2)
+        return seq + 2
+
+
+class StateMirrorReader:
+    """Copies consistent snapshots out of the mirror file written by the primary."""
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._mm: Optional[mmap.mmap] = None
+        self._inode: Optional[int] = None
+        self._seq: Optional[int] = None
+        self._snapshot: Optional[MirrorSnapshot] = None
+
+    def read(self) -> Optional[MirrorSnapshot]:
+        """Return the latest snapshot, or ``None`` until the primary publishes one."""
+        try:
+            inode = os.stat(self._path).st_ino
+        except FileNotFoundError:
+            return self._snapshot
+        if inode != self._inode:
+            self._remap(inode)
+        mm = self._mm
+        if mm is None:
+            return self._snapshot
+
+        for _ in range(MIRROR_READ_ATTEMPTS):
+            seq, version, length, count, etag = MIRROR_HEADER.unpack_from(mm, 0)
+            if seq % 2:
+                continue  # write in progress
+            if seq == self._seq:
+                return self._snapshot
+            body = mm[MIRROR_HEADER.size : MIRROR_HEADER.size + length]
+            if MIRROR_SEQ.unpack_from(mm, 0)[0] != seq:
+                continue
+            self._seq = seq
+            self._snapshot = MirrorSnapshot(version, count, etag.rstrip(b"\0").decode(), body)
+            return self._snapshot
+        return self._snapshot
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def _remap(self, inode: int) -> None:
+        self.close()
+        self._inode = inode
+        self._seq = None
+        try:
+            with open(self._path, "rb") as handle:
+                self._mm = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            self._inode = None  # replaced or still empty; retry on the next read
+
+
+class _EncodedUnits(Sequence):
+    """Per-unit JSON fragments of a decoded mirror, encoded only when read."""
+
+    def __init__(self, units: List[dict]) -> None:
+        self._units = units
+
+    def __len__(self) -> int:
+        return len(self._units)
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return [json.dumps(unit, separators=(",", ":")) for unit in self._units[index]]
+        return json.dumps(self._units[index], separators=(",", ":"))
+
+
+class MirroredStateManager:
+    """Read-only stand-in for ``StateManager`` backed by the shared mirror."""
+
+    def __init__(self, reader: StateMirrorReader) -> None:
+        self._reader = reader
+        self._cache = PublicStateCache(version=0, units=PublicUnitList(), fragments=(), body=b"[]", etag='"mirror-0"')
+
+    @property
+    def version(self) -> int:
+        return self.public_state().version
+
+    def public_state(self) -> PublicStateCache:
+        snapshot = self._reader.read()
+        if snapshot is None or snapshot.etag == self._cache.etag:
+            return self._cache
+        units = PublicUnitList(json.loads(snapshot.body), snapshot.body.decode())
+        self._cache = PublicStateCache(
+            version=snapshot.version,
+            units=units,
+            fragments=_EncodedUnits(units),  # type: ignore[arg-type]
+            body=snapshot.body,
+            etag=snapshot.etag,
+        )
+        return self._cache
+
+    async def get_public_state_payload(self, event_type: str = "state_update") -> dict:
+        return {
+            "type": event_type,
+            "units": self.public_state().units,
+            "timestamp": utc_now().isoformat(),
+        }
+
+    async def unit_count(self) -> int:
+        snapshot = self._reader.read()
+        return snapshot.count if snapshot is not None else 0
+
+
+class MirroredThreatEngine:
+    """Active alerts as last sent by the primary."""
+
+    def __init__(self) -> None:
+        self.active_alerts: List[AlertPayload] = []
+
+
+class MirroredAnomalyEngine:
+    """ML status as last sent by the primary."""
+
+    def __init__(self) -> None:
+        self.is_loaded = False
+        self.is_trained = False
+
+
+# ----------------------------------------------------------------------
+# Pub/sub and request-forwarding channel
+# ----------------------------------------------------------------------
+
+
+def _write_frame(writer: asyncio.StreamWriter, meta: dict, body: bytes = b"") -> None:
+    encoded = json.dumps(meta, separators=(",", ":")).encode()
+    writer.write(FRAME_HEADER.pack(len(encoded), len(body)) + encoded)
+    if body:
+        writer.write(body)
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Tuple[dict, bytes]:
+    meta_length, body_length = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    meta = json.loads(await reader.readexactly(meta_length))
+    body = await reader.readexactly(body_length) if body_length else b""
+    return meta, body
+
+
+async def _call_asgi(app: Any, meta: dict, body: bytes) -> Tuple[int, List[List[str]], bytes]:
+    """Run a forwarded HTTP request through *app* in-process and collect the response."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": meta["method"],
+        "scheme": "http",
+        "path": meta["path"],
+        "raw_path": meta["path"].encode(),
+        "query_string": meta["query_string"].encode("latin-1"),
+        "root_path": "",
+        "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in meta["headers"]],
+        "client": ("127.0.0.1", 0),
+        "server": None,
+    }
+    delivered = False
+    finished = asyncio.Event()
+    response: Dict[str, Any] = {"status": 500, "headers": [], "body": []}
+
+    async def receive() -> dict:
+        nonlocal delivered
+        if not delivered:
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = [[k.decode("latin-1"), v.decode("latin-1")] for k, v in message.get("headers", [])]
+        elif message["type"] == "http.response.body":
+            response["body"].append(message.get("body", b""))
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        finished.set()
+    return response["status"], response["headers"], b"".join(response["body"])
+
+
+async def _send_response(send: Any, status: int, headers: List[List[str]], body: bytes) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class _ReplicaLink:
+    """The primary's send side of one replica connection.
+
+    Frames are written by a task of the link's own, so a slow replica never
+    holds up the tick or the primary's own fan-out.  A broadcast still waiting
+    when a newer one arrives is merged into it (keeping its new ``alerts``)
+    rather than queued behind it; likewise only the latest engine status waits.
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        self.writer = writer
+        self._broadcast: Optional[dict] = None
+        self._broadcast_units = False
+        self._engines: Optional[dict] = None
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._send_loop())
+
+    def send_broadcast(self, payload: dict, units: bool) -> None:
+        """Queue *payload* (without its unit list); *units* says whether it had one."""
+        if self._broadcast is not None and "alerts" in self._broadcast:
+            payload = {**payload, "alerts": self._broadcast["alerts"] + payload.get("alerts", [])}
+        self._broadcast = payload
+        self._broadcast_units = self._broadcast_units or units
+        if "active_alerts" in payload and "ml_status" in payload:
+            self._engines = None  # superseded by the status the broadcast carries
+        self._ready.set()
+
+    def send_engines(self, status: dict) -> None:
+        self._engines = status
+        self._ready.set()
+
+    def close(self) -> None:
+        self._task.cancel()
+        self.writer.close()
+
+    async def _send_loop(self) -> None:
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                # Broadcast first: a pending engine status is never older than it
+                if self._broadcast is not None:
+                    payload, units = self._broadcast, self._broadcast_units
+                    self._broadcast, self._broadcast_units = None, False
+                    body = json.dumps(payload, separators=(",", ":")).encode()
+                    _write_frame(self.writer, {"kind": "broadcast", "units": units}, body)
+                if self._engines is not None:
+                    status, self._engines = self._engines, None
+                    _write_frame(self.writer, {"kind": "engines"}, json.dumps(status, separators=(",", ":")).encode())
+                await self.writer.drain()
+        except ConnectionError:
+            self.writer.close()
+
+
+# ----------------------------------------------------------------------
+# Roles
+# ----------------------------------------------------------------------
+
+
+class WorkerCluster:
+    """Elects this worker's role and runs its side of the mirror and channel."""
+
+    def __init__(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self._lock_path = os.path.join(directory, "primary.lock")
+        self._socket_path = os.path.join(directory, "channel.sock")
+        self._mirror_path = os.path.join(directory, "state.mirror")
+        self._lock_fd: Optional[int] = None
+        self.role: Optional[str] = None
+        # Primary side
+        self._app: Any = None
+        self._state_manager: Optional[StateManager] = None
+        self._mirror_writer: Optional[StateMirrorWriter] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._replicas: Dict[asyncio.StreamWriter, _ReplicaLink] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        # Alerts and ML status replicas were last sent, as JSON-ready dicts
+        self._engines_sent: Optional[dict] = None
+        # Replica side
+        self._mirror_reader: Optional[StateMirrorReader] = None
+        self._mirrored_state: Optional[MirroredStateManager] = None
+        self._websocket_manager: Optional[WebsocketManager] = None
+        self._threat_view = MirroredThreatEngine()
+        self._anomaly_view = MirroredAnomalyEngine()
+        self._channel: Optional[asyncio.StreamWriter] = None
+        self._channel_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._request_ids = itertools.count()
+
+    @classmethod
+    def from_env(cls) -> Optional["WorkerCluster"]:
+        directory = os.environ.get("CLUSTER_DIR")
+        return cls(directory) if directory else None
+
+    def elect(self) -> bool:
+        """Take the primary lock if no other worker holds it; return whether we did."""
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            self.role = "replica"
+            return False
+        self._lock_fd = fd  # held for the life of the process
+        self.role = "primary"
+        return True
+
+    async def stop(self) -> None:
+        if self._channel_task is not None:
+            self._channel_task.cancel()
+        if self._server is not None:
+            self._server.close()
+            for link in list(self._replicas.values()):
+                link.close()
+        for task in list(self._tasks):
+            task.cancel()
+        for closable in (self._mirror_writer, self._mirror_reader):
+            if closable is not None:
+                closable.close()
+
+    # ------------------------------------------------------------------
+    # Primary
+    # ------------------------------------------------------------------
+
+    async def start_primary(self, app: Any, state_manager: StateManager, websocket_manager: WebsocketManager) -> None:
+        self._app = app
+        self._state_manager = state_manager
+        self._mirror_writer = StateMirrorWriter(self._mirror_path)
+        self._mirror_writer.publish(state_manager.public_state())
+        if os.path.exists(self._socket_path):
+            os.unlink(self._socket_path)
+        self._server = await asyncio.start_unix_server(self._serve_replica, path=self._socket_path)
+        websocket_manager.add_relay(self._relay)
+        task = asyncio.create_task(self._watch_engines())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _relay(self, payload: dict) -> None:
+        """Mirror the state and push the rest of *payload* to every replica."""
+        assert self._mirror_writer is not None and self._state_manager is not None
+        has_units = "units" in payload
+        if has_units:
+            self._mirror_writer.publish(self._state_manager.public_state())
+        if "active_alerts" in payload and "ml_status" in payload:
+            self._engines_sent = {"active_alerts": payload["active_alerts"], "ml_status": payload["ml_status"]}
+        if not self._replicas:
+            return
+        rest = {k: v for k, v in payload.items() if k != "units"}
+        for link in self._replicas.values():
+            link.send_broadcast(rest, has_units)
+
+    def _engine_status(self) -> dict:
+        threat_engine, anomaly_engine = self._app.state.threat_engine, self._app.state.anomaly_engine
+        return {
+            "active_alerts": [a.model_dump(mode="json") for a in threat_engine.active_alerts],
+            "ml_status": {"loaded": anomaly_engine.is_loaded, "trained": anomaly_engine.is_trained},
+        }
+
+    async def _watch_engines(self) -> None:
+        """Send alerts and ML status to replicas when they change between broadcasts."""
+        while True:
+            await asyncio.sleep(ENGINE_SYNC_INTERVAL_S)
+            status = self._engine_status()
+            if status != self._engines_sent:
+                self._engines_sent = status
+                for link in self._replicas.values():
+                    link.send_engines(status)
+
+    async def _serve_replica(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        link = _ReplicaLink(writer)
+        # A replica starts with no alerts and no ML status of its own
+        link.send_engines(self._engine_status())
+        self._replicas[writer] = link
+        try:
+            while True:
+                meta, body = await _read_frame(reader)
+                if meta.get("kind") == "request":
+                    task = asyncio.create_task(self._answer(writer, meta, body))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._replicas.pop(writer, None)
+            link.close()
+
+    async def _answer(self, writer: asyncio.StreamWriter, meta: dict, body: bytes) -> None:
+        try:
+            status, headers, content = await _call_asgi(self._app, meta, body)
+        except Exception:
+            logger.exception("forwarded %s %s failed", meta.get("method"), meta.get("path"))
+            status, headers, content = 500, [["content-type", "text/plain"]], b"Internal Server Error"
+        if writer.is_closing():
+            return
+        _write_frame(writer, {"kind": "response", "id": meta["id"], "status": status, "headers": headers}, content)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    # ------------------------------------------------------------------
+    # Replica
+    # ------------------------------------------------------------------
+
+    async def start_replica(self, app: Any, websocket_manager: WebsocketManager) -> None:
+        """Point *app* at the mirror and subscribe to the primary's broadcasts."""
+        self._mirror_reader = StateMirrorReader(self._mirror_path)
+        self._mirrored_state = MirroredStateManager(self._mirror_reader)
+        self._websocket_manager = websocket_manager
+        app.state.state_manager = self._mirrored_state
+        app.state.threat_engine = self._threat_view
+        app.state.anomaly_engine = self._anomaly_view
+        app.state.movement_engine = None
+        self._channel_task = asyncio.create_task(self._follow_primary())
+
+    async def _follow_primary(self) -> None:
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self._socket_path)
+            except OSError:
+                await asyncio.sleep(RECONNECT_DELAY_S)
+                continue
+            self._channel = writer
+            try:
+                while True:
+                    meta, body = await _read_frame(reader)
+                    if meta["kind"] == "response":
+                        future = self._pending.pop(meta["id"], None)
+                        if future is not None and not future.done():
+                            future.set_result((meta["status"], meta["headers"], body))
+                    elif meta["kind"] == "broadcast":
+                        await self._deliver(meta, body)
+                    elif meta["kind"] == "engines":
+                        self._update_engines(json.loads(body))
+            except (asyncio.IncompleteReadError, ConnectionError):
+                logger.warning("lost the channel to the primary; reconnecting")
+            finally:
+                self._channel = None
+                writer.close()
+                for future in self._pending.values():
+                    if not future.done():
+                        future.set_exception(ConnectionError("primary went away"))
+                self._pending.clear()
+            await asyncio.sleep(RECONNECT_DELAY_S)
+
+    def _update_engines(self, payload: dict) -> None:
+        if "active_alerts" in payload:
+            self._threat_view.active_alerts = [AlertPayload.model_validate(a) for a in payload["active_alerts"]]
+        if "ml_status" in payload:
+            self._anomaly_view.is_loaded = payload["ml_status"]["loaded"]
+            self._anomaly_view.is_trained = payload["ml_status"]["trained"]
+
+    async def _deliver(self, meta: dict, body: bytes) -> None:
+        payload = json.loads(body)
+        self._update_engines(payload)
+        if meta["units"]:
+            assert self._mirrored_state is not None
+            payload["units"] = self._mirrored_state.public_state().units
+        assert self._websocket_manager is not None
+        await self._websocket_manager.broadcast(payload)
+
+    async def forward(self, scope: dict, receive: Any, send: Any) -> None:
+        """Replay an HTTP request on the primary and relay its response."""
+        chunks: List[bytes] = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+
+        channel = self._channel
+        if channel is None:
+            await _send_response(send, 503, [["content-type", "text/plain"]], b"Primary worker unavailable")
+            return
+        request_id = next(self._request_ids)
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        meta = {
+            "kind": "request",
+            "id": request_id,
+            "method": scope["method"],
+            "path": scope["path"],
+            "query_string": scope.get("query_string", b"").decode("latin-1"),
+            "headers": [[k.decode("latin-1"), v.decode("latin-1")] for k, v in scope["headers"]],
+        }
+        _write_frame(channel, meta, b"".join(chunks))
+        try:
+            await channel.drain()
+            status, headers, content = await asyncio.wait_for(future, FORWARD_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            status, headers, content = 504, [["content-type", "text/plain"]], b"Primary worker timed out"
+        except ConnectionError:
+            status, headers, content = 503, [["content-type", "text/plain"]], b"Primary worker unavailable"
+        finally:
+            self._pending.pop(request_id, None)
+        await _send_response(send, status, headers, content)
+
+
+class ReplicaForwardingMiddleware:
+    """ASGI middleware that hands a replica's write requests to the primary."""
+
+    def __init__(self, app: Any, cluster: WorkerCluster) -> None:
+        self.app = app
+        self._cluster = cluster
+
+    async def __call__(self, scope: dict, receive: Any, send: Any) -> None:
+        if scope["type"] == "http" and scope["method"] not in SAFE_METHODS and self._cluster.role == "replica":
+            await self._cluster.forward(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -0,0 +1,71 @@
+"""Fleet-wide summary for clients that do not take the full unit stream."""
+
+from __future__ import annotations
+
+import heapq
+from operator import itemgetter
+from typing import Dict, List, Optional, Sequence
+
+from .models import RosterPage, UnitStatus
+
+# Units listed in the summary's risk ranking
+TOP_RISK_LIMIT = 10
+# Risk above which a unit counts as a threat (the threat engine's elevated level)
+THREAT_RISK = 0.55
+
+
+class FleetSummary:
+    """Aggregates one payload's public unit dicts for the dashboard panels.
+
+    The overview is computed once and each roster order is sorted once, so
+    every subscriber of a broadcast shares them whatever page it is shown.
+    """
+
+    def __init__(self, units: Sequence[dict]) -> None:
+        self._units = units
+        self._overview: Optional[dict] = None
+        self._sorted: Dict[str, List[dict]] = {}
+
+    def for_page(self, page: RosterPage) -> dict:
+        return {**self.overview(), "roster": self.roster(page)}
+
+    def overview(self) -> dict:
+        if self._overview is not None:
+            return self._overview
+        units = self._units
+        status_counts = {status.value: 0 for status in UnitStatus}
+        total_risk = 0.0
+        threats = 0
+        for unit in units:
+            status_counts[unit["status"]] += 1
+            total_risk += unit["risk_score"]
+            threats += unit["risk_score"] > THREAT_RISK
+        bounds = None
+        if units:
+            lats = [unit["lat"] for unit in units]
+            lons = [unit["lon"] for unit in units]
+            bounds = {"south": min(lats), "west": min(lons), "north": max(lats), "east": max(lons)}
+        ranked = (unit for unit in units if unit["risk_score"] > 0)
+        self._overview = {
+            "unit_count": len(units),
+            "status_counts": status_counts,
+            "avg_risk": total_risk / len(units) if units else 0.0,
+            "max_risk": max((unit["risk_score"] for unit in units), default=0.0),
+            "threat_count": threats,
+            "bounds": bounds,
+            "top_risk": heapq.nlargest(TOP_RISK_LIMIT, ranked, key=itemgetter("risk_score")),
+        }
+        return self._overview
+
+    def roster(self, page: RosterPage) -> dict:
+        """Return one page of the roster in the requested order."""
+        ordered = self._sorted.get(page.sort)
+        if ordered is None:
+            ordered = self._sorted[page.sort] = sorted(self._units, key=itemgetter(page.sort))
+        total = len(ordered)
+        if page.order == "asc":
+            units = ordered[page.offset : page.offset + page.limit]
+        else:
+            end = max(total - page.offset, 0)
+            units = ordered[max(end - page.limit, 0) : end][::-1]
+        return {**page.model_dump(), "total": total, "units": units}
@@ -2,18 +2,35 @@
 
 from __future__ import annotations
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import asyncio
+import logging
+import os
+
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, status
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import ValidationError
 
 from .anomaly_engine import AnomalyEngine
+from .cluster import ReplicaForwardingMiddleware, WorkerCluster
+from .models import SubscriptionRequest
 from .movement_engine import MovementEngine
+from .prediction_engine import PredictionEngine
 from .routes import router as api_router
 from .state_manager import StateManager
 from .threat_engine import ThreatEngine
 from .websocket_manager import WebsocketManager
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="Autonomous Threat Intelligence Backend", version="0.1.0")
 
+# Set CLUSTER_DIR to run under `uvicorn --workers N`: one worker owns the state
+# and the simulation, the others mirror it (see app/cluster.py)
+cluster = WorkerCluster.from_env()
+if cluster is not None:
+    # Added before CORS so forwarded responses still get CORS headers
+    app.add_middleware(ReplicaForwardingMiddleware, cluster=cluster)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -22,39 +39,102 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-state_manager = StateManager()
+# Seconds of silence after which a unit is marked offline; unset disables it,
+# since simulated units are moved centrally and do not report on their own
+OFFLINE_AFTER_SECONDS = float(os.environ.get("OFFLINE_AFTER_SECONDS", "0")) or None
+
+state_manager = StateManager(offline_after_s=OFFLINE_AFTER_SECONDS)
 anomaly_engine = AnomalyEngine()
 threat_engine = ThreatEngine()
+prediction_engine = PredictionEngine()
 websocket_manager = WebsocketManager()
-movement_engine = MovementEngine(state_manager, websocket_manager, anomaly_engine, threat_engine)
+movement_engine = MovementEngine(state_manager, websocket_manager, anomaly_engine, threat_engine, prediction_engine)
 
 app.state.state_manager = state_manager  # type: ignore[attr-defined]
 app.state.websocket_manager = websocket_manager  # type: ignore[attr-defined]
 app.state.threat_engine = threat_engine  # type: ignore[attr-defined]
+app.state.anomaly_engine = anomaly_engine  # type: ignore[attr-defined]
 
 app.include_router(api_router, prefix="/api")
 
 
 @app.on_event("startup")
 async def on_startup() -> None:
+    if cluster is not None:
+        if not cluster.elect():
+            await cluster.start_replica(app, websocket_manager)
+            return
+        await cluster.start_primary(app, state_manager, websocket_manager)
     movement_engine.start()
+    # Import the ML stack off the event loop so requests are served meanwhile
+    app.state.ml_warm_up = asyncio.create_task(asyncio.to_thread(anomaly_engine.warm_up))  # type: ignore[attr-defined]
+    app.state.ml_warm_up.add_done_callback(_log_warm_up_failure)  # type: ignore[attr-defined]
+
+
+def _log_warm_up_failure(task: asyncio.Task) -> None:
+    # Nothing awaits the warm-up, so its failure would otherwise go unreported
+    if task.cancelled() or task.exception() is None:
+        return
+    logger.error(
+        "loading the ML stack failed; anomaly scores stay at 0 until restart",
+        exc_info=task.exception(),
+    )
 
 
 @app.on_event("shutdown")
 async def on_shutdown() -> None:
+    if cluster is not None:
+        await cluster.stop()
     await movement_engine.stop()
 
 
+def _subscription_from_query(websocket: WebSocket) -> SubscriptionRequest:
+    """Build the connect-time subscription from the query string.
+
+    Accepts ``?topics=a,b&unit_id=..&max_rate_hz=..&viewport=south,west,north,east,zoom``
+    and ``roster=offset,limit,sort,order``.
+    """
+    params = websocket.query_params
+    fields: dict = {}
+    if "viewport" in params:
+        fields["viewport"] = dict(zip(("south", "west", "north", "east", "zoom"), params["viewport"].split(",")))
+    if "roster" in params:
+        fields["roster"] = dict(zip(("offset", "limit", "sort", "order"), params["roster"].split(",")))
+    if "topics" in params:
+        fields["topics"] = [topic for topic in params["topics"].split(",") if topic]
+    if "unit_id" in params:
+        fields["unit_id"] = params["unit_id"]
+    if "max_rate_hz" in params:
+        fields["max_rate_hz"] = params["max_rate_hz"]
+    return SubscriptionRequest.model_validate(fields)
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket) -> None:
-    await websocket_manager.connect(websocket)
+    try:
+        subscription = _subscription_from_query(websocket)
+    except ValidationError:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    # A replica worker swaps in a mirror of the primary's state at startup
+    state_manager = websocket.app.state.state_manager
+    await websocket_manager.connect(websocket, subscription)
     try:
         await websocket_manager.send_personal(
             websocket,
             await state_manager.get_public_state_payload(event_type="state_init"),
         )
         while True:
-            await websocket.receive_text()
+            message = await websocket.receive_text()
+            try:
+                request = SubscriptionRequest.model_validate_json(message)
+            except ValidationError:
+                continue
+            await websocket_manager.subscribe(websocket, request)
+            await websocket_manager.send_personal(
+                websocket,
+                await state_manager.get_public_state_payload(event_type="state_init"),
+            )
     except WebSocketDisconnect:
         await websocket_manager.disconnect(websocket)
     except Exception:
@@ -5,7 +5,7 @@ from __future__ import annotations
 from dataclasses import dataclass, replace
 from datetime import datetime, timezone
 from enum import Enum
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -64,6 +64,38 @@ class UnitPublicState(BaseModel):
     destination: Optional[Destination] = None
 
 
+class ViewportSubscription(BaseModel):
+    south: float = Field(..., ge=-90.0, le=90.0)
+    west: float = Field(..., ge=-180.0, le=180.0)
+    north: float = Field(..., ge=-90.0, le=90.0)
+    east: float = Field(..., ge=-180.0, le=180.0)
+    zoom: int = Field(..., ge=0, le=24)
+
+
+StreamTopic = Literal["units", "alerts", "ml_status", "summary"]
+RosterSortKey = Literal["unit_id", "status", "speed_mps", "direction_deg", "risk_score"]
+
+
+class RosterPage(BaseModel):
+    """Which slice of the fleet roster a ``summary`` subscriber is shown."""
+
+    offset: int = Field(0, ge=0)
+    limit: int = Field(50, ge=1, le=200)
+    sort: RosterSortKey = "unit_id"
+    order: Literal["asc", "desc"] = "asc"
+
+
+class SubscriptionRequest(BaseModel):
+    """Client → server WebSocket message narrowing what the client receives."""
+
+    type: Literal["subscribe"] = "subscribe"
+    viewport: Optional[ViewportSubscription] = None
+    topics: Optional[list[StreamTopic]] = None
+    unit_id: Optional[str] = Field(None, min_length=3, max_length=64)
+    max_rate_hz: Optional[float] = Field(None, gt=0.0, le=50.0)
+    roster: Optional[RosterPage] = None
+
+
 class AlertPayload(BaseModel):
     alert_id: str
     severity: str
@@ -90,6 +122,15 @@ class UnitRuntimeState:
         return replace(self)
 
 
+class BulkDeregistrationRequest(BaseModel):
+    unit_ids: list[str] = Field(..., min_length=1)
+
+
+class BulkOperationResult(BaseModel):
+    count: int
+    version: int
+
+
 def runtime_to_public(state: UnitRuntimeState) -> UnitPublicState:
     """Convert an internal runtime state into an API-friendly payload."""
 
@@ -106,3 +147,43 @@ def runtime_to_public(state: UnitRuntimeState) -> UnitPublicState:
         last_update=state.last_update,
         destination=state.destination,
     )
+
+
+def runtime_to_public_dict(state: UnitRuntimeState) -> dict:
+    """Fast path for ``runtime_to_public(state).model_dump(mode="json")``.
+
+    Skips model validation, which dominates when serializing whole fleets.
+    """
+
+    destination = state.destination
+    return {
+        "unit_id": state.unit_id,
+        "label": state.label,
+        "lat": float(state.lat),
+        "lon": float(state.lon),
+        "speed_mps": float(state.speed_mps),
+        "direction_deg": float(state.direction_deg),
+        "status": state.status.value,
+        "anomaly_score": float(state.anomaly_score),
+        "risk_score": float(state.risk_score),
+        "last_update": state.last_update.isoformat().replace("+00:00", "Z"),
+        "destination": {"lat": destination.lat, "lon": destination.lon} if destination else None,
+    }
+
+
+def public_to_runtime(state: UnitPublicState) -> UnitRuntimeState:
+    """Rebuild a runtime state from an exported public payload."""
+
+    return UnitRuntimeState(
+        unit_id=state.unit_id,
+        label=state.label,
+        lat=state.lat,
+        lon=state.lon,
+        speed_mps=state.speed_mps,
+        direction_deg=state.direction_deg,
+        status=state.status,
+        anomaly_score=state.anomaly_score,
+        risk_score=state.risk_score,
+        last_update=state.last_update,
+        destination=state.destination,
+    )
@@ -4,15 +4,18 @@ from __future__ import annotations
 
 import asyncio
 import math
-from typing import Optional
+from typing import Iterable, Optional
 
 from .anomaly_engine import AnomalyEngine
 from .models import UnitRuntimeState, UnitStatus, utc_now
+from .prediction_engine import PredictionEngine
 from .state_manager import StateManager
 from .threat_engine import ThreatEngine
 from .websocket_manager import WebsocketManager
 
 EARTH_RADIUS_M = 6_371_000
+# Units processed between cooperative yields to the event loop during a tick
+TICK_YIELD_EVERY = 250
 
 
 class MovementEngine:
@@ -24,16 +27,19 @@ class MovementEngine:
         websocket_manager: WebsocketManager,
         anomaly_engine: AnomalyEngine,
         threat_engine: ThreatEngine,
+        prediction_engine: PredictionEngine,
         tick_interval: float = 1.0,
     ) -> None:
         self._state_manager = state_manager
         self._websocket_manager = websocket_manager
         self._anomaly_engine = anomaly_engine
         self._threat_engine = threat_engine
+        self._prediction_engine = prediction_engine
         self._tick_interval = tick_interval
         self._task: Optional[asyncio.Task] = None
         self._running = False
         self._last_tick = utc_now()
+        state_manager.add_removal_listener(self.forget_units)
 
     def start(self) -> None:
         if self._task is not None:
@@ -51,6 +57,13 @@ class MovementEngine:
                 pass
             self._task = None
 
+    def forget_units(self, unit_ids: Iterable[str]) -> None:
+        """Release per-unit engine state for units removed from the fleet."""
+        for unit_id in unit_ids:
+            self._anomaly_engine.forget_unit(unit_id)
+            self._threat_engine.forget_unit(unit_id)
+            self._prediction_engine.forget_unit(unit_id)
+
     async def _run_loop(self) -> None:
         while self._running:
             await self._tick()
@@ -60,39 +73,64 @@ class MovementEngine:
         now = utc_now()
         delta = (now - self._last_tick).total_seconds()
         self._last_tick = now
-        units = await self._state_manager.snapshot_units()
 
-        if not units:
-            return
+        # Units whose silence exceeded the offline timeout (O(expired), not a scan)
+        gone_offline = await self._state_manager.expire_offline()
+        units = await self._state_manager.begin_tick()
 
-        did_change = False
-        for unit in units:
-            changed = False
+        changed_units = []
+        replayed = False
+        try:
+            # 0) Batch trajectory prediction feeding per-unit risk and correlation.
+            # It only reads this tick's clones and is mostly NumPy, so it runs in
+            # a worker thread while ingest and reads carry on against the loop
+            signals = await asyncio.to_thread(self._prediction_engine.predict, units)
+            self._threat_engine.apply_predictions(signals)
+
+            # Offline units are neither moved nor scored until they report again
+            tracked = [unit for unit in units if unit.status != UnitStatus.offline]
 
             # 1) Integrate motion for active units
-            if unit.status == UnitStatus.active:
-                changed |= self._integrate_motion(unit, delta)
-
-            # 2) Compute anomaly score (also records baseline if not yet trained)
-            new_anomaly = self._anomaly_engine.score_unit(unit)
-            if abs(new_anomaly - unit.anomaly_score) > 1e-6:
-                unit.anomaly_score = new_anomaly
-                changed = True
-
-            # 3) Compute per-unit risk
-            new_risk = self._threat_engine.evaluate_unit(unit)
-            if abs(new_risk - unit.risk_score) > 1e-6:
-                unit.risk_score = new_risk
-                changed = True
-
-            if changed:
-                unit.last_update = now
-                await self._state_manager.persist_unit(unit)
-                did_change = True
+            moved = []
+            for index, unit in enumerate(tracked):
+                # Let ingest and reads run between batches of a large fleet
+                if index and index % TICK_YIELD_EVERY == 0:
+                    await asyncio.sleep(0)
+                moved.append(unit.status == UnitStatus.active and self._integrate_motion(unit, delta))
+
+            # 2) Anomaly scores for the whole batch (also records baseline if not
+            # yet trained); one model call, off the loop like the prediction
+            scores = await asyncio.to_thread(self._anomaly_engine.score_units, tracked)
+
+            for index, (unit, new_anomaly, changed) in enumerate(zip(tracked, scores, moved)):
+                if index and index % TICK_YIELD_EVERY == 0:
+                    await asyncio.sleep(0)
+
+                if abs(new_anomaly - unit.anomaly_score) > 1e-6:
+                    unit.anomaly_score = new_anomaly
+                    changed = True
+
+                # 3) Compute per-unit risk
+                new_risk = self._threat_engine.evaluate_unit(unit)
+                if abs(new_risk - unit.risk_score) > 1e-6:
+                    unit.risk_score = new_risk
+                    changed = True
+
+                if changed:
+                    unit.last_update = now
+                    changed_units.append(unit)
+        finally:
+            replayed = await self._state_manager.commit_tick(changed_units)
+
+        if not units and not replayed:
+            return
+        # Writes queued during the tick were not broadcast by their routes
+        did_change = bool(changed_units) or bool(gone_offline) or replayed
 
         # 4) Cross-unit threat correlation & alert generation
-        updated_units = await self._state_manager.snapshot_units()
-        new_alerts = self._threat_engine.evaluate_all(updated_units)
+        updated_units = [u for u in self._state_manager.published().units if u.status != UnitStatus.offline]
+        new_alerts = self._threat_engine.report_offline(gone_offline)
+        new_alerts += self._threat_engine.evaluate_all(updated_units)
 
         # 5) Broadcast state + any new alerts
         if did_change or new_alerts:
@@ -103,6 +141,7 @@ class MovementEngine:
                 a.model_dump(mode="json") for a in self._threat_engine.active_alerts
             ]
             payload["ml_status"] = {
+                "loaded": self._anomaly_engine.is_loaded,
                 "trained": self._anomaly_engine.is_trained,
             }
             await self._websocket_manager.broadcast(payload)
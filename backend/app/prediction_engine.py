@@ -0,0 +1,279 @@
+"""Short-horizon trajectory prediction and route-deviation scoring."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .models import UnitRuntimeState, UnitStatus
+
+EARTH_RADIUS_M = 6_371_000
+# How far ahead tracks are extrapolated, and how often they are sampled
+PREDICTION_HORIZON_S = 60.0
+PREDICTION_STEP_S = 10.0
+# Two units predicted to pass closer than this are flagged
+PROXIMITY_RADIUS_M = 150.0
+# Closing speeds above this are treated as telemetry glitches for pair search
+MAX_CLOSING_SPEED_MPS = 60.0
+# Cross-track distance tolerated before a unit counts as off-route, and the
+# additional distance over which the deviation score ramps up to 1
+ROUTE_CORRIDOR_M = 200.0
+ROUTE_DEVIATION_SPAN_M = 800.0
+
+
+@dataclass
+class PredictionSignals:
+    """Per-unit predictive risk signals in [0, 1] produced by one batch."""
+
+    proximity: Dict[str, float] = field(default_factory=dict)
+    route_deviation: Dict[str, float] = field(default_factory=dict)
+    # (unit_a, unit_b, seconds until closest approach, closest distance in metres)
+    converging_pairs: List[Tuple[str, str, float, float]] = field(default_factory=list)
+
+    def unit_signal(self, unit_id: str) -> float:
+        return max(self.proximity.get(unit_id, 0.0), self.route_deviation.get(unit_id, 0.0))
+
+
+class PredictionEngine:
+    """Extrapolates constant-velocity tracks for the whole fleet in one batch.
+
+    Active units follow their reported heading, or steer towards their
+    destination and stop on arrival, mirroring ``MovementEngine``.  Idle and
+    paused units are predicted to stay put; offline units are ignored.
+
+    ``predict`` is called from a worker thread while the event loop keeps
+    running, so it only reads the units it is given and replaces ``_routes``
+    rather than iterating it.  A batch costs about 0.9 s per 100k units.
+    """
+
+    def __init__(
+        self,
+        horizon_s: float = PREDICTION_HORIZON_S,
+        step_s: float = PREDICTION_STEP_S,
+        proximity_radius_m: float = PROXIMITY_RADIUS_M,
+    ) -> None:
+        self._horizon_s = horizon_s
+        self._step_s = step_s
+        self._proximity_radius_m = proximity_radius_m
+        # unit_id -> (origin_lat, origin_lon, dest_lat, dest_lon) of the assigned route
+        self._routes: Dict[str, Tuple[float, float, float, float]] = {}
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def predict(self, units: Sequence[UnitRuntimeState]) -> PredictionSignals:
+        tracked = [u for u in units if u.status != UnitStatus.offline]
+        routes = self._update_routes(tracked)
+        if not tracked:
+            return PredictionSignals()
+
+        nan = float("nan")
+        data = np.array(
+            [
+                (
+                    u.lat,
+                    u.lon,
+                    u.speed_mps if u.status == UnitStatus.active else 0.0,
+                    u.direction_deg,
+                    u.destination.lat if u.destination else nan,
+                    u.destination.lon if u.destination else nan,
+                )
+                for u in tracked
+            ],
+            dtype=float,
+        )
+        lat, lon, speed, heading_deg, dest_lat, dest_lon = data.T
+        has_dest = ~np.isnan(dest_lat)
+
+        # Fleet-wide planar frame: per-unit longitude scale, centred on the
+        # median longitude so the scale mismatch between neighbours stays small
+        lon_ref = float(np.median(lon))
+        x, y = self._to_metres(lat, lon, lon_ref)
+        heading = np.radians(heading_deg)
+        arrival = np.full(len(tracked), np.inf)
+        if has_dest.any():
+            heading[has_dest] = self._bearing(lat[has_dest], lon[has_dest], dest_lat[has_dest], dest_lon[has_dest])
+            distance = self._haversine(lat[has_dest], lon[has_dest], dest_lat[has_dest], dest_lon[has_dest])
+            moving = speed[has_dest] > 0
+            arrival[has_dest] = np.where(moving, distance / np.where(moving, speed[has_dest], 1.0), np.inf)
+        vx, vy = speed * np.sin(heading), speed * np.cos(heading)
+
+        ids = [u.unit_id for u in tracked]
+        signals = PredictionSignals()
+        self._predicted_proximity(ids, x, y, vx, vy, arrival, signals)
+        self._route_deviation(tracked, lat, lon, routes, signals)
+        return signals
+
+    def forget_unit(self, unit_id: str) -> None:
+        self._routes.pop(unit_id, None)
+
+    # ------------------------------------------------------------------
+    # Predicted proximity
+    # ------------------------------------------------------------------
+
+    def _predicted_proximity(
+        self,
+        ids: List[str],
+        x: np.ndarray,
+        y: np.ndarray,
+        vx: np.ndarray,
+        vy: np.ndarray,
+        arrival: np.ndarray,
+        signals: PredictionSignals,
+    ) -> None:
+        """Flag pairs whose closest point of approach falls inside the horizon."""
+        n = len(ids)
+        if n < 2:
+            return
+
+        # Candidate pairs: neighbours at each sampled time, with the search
+        # radius widened so a closest approach between samples is not missed
+        closing = min(float(np.hypot(vx, vy).max()) * 2, MAX_CLOSING_SPEED_MPS)
+        search_radius = self._proximity_radius_m + closing * self._step_s / 2
+        candidates = []
+        for t in np.arange(0.0, self._horizon_s + 1e-9, self._step_s):
+            travel = np.minimum(t, arrival)
+            i, j = _neighbour_pairs(x + vx * travel, y + vy * travel, search_radius)
+            candidates.append(i * n + j)
+        keys = np.unique(np.concatenate(candidates))
+        if keys.size == 0:
+            return
+        i, j = keys // n, keys % n
+
+        # Analytic closest approach for each candidate (constant relative velocity)
+        px, py = x[j] - x[i], y[j] - y[i]
+        rvx, rvy = vx[j] - vx[i], vy[j] - vy[i]
+        rv2 = rvx * rvx + rvy * rvy
+        limit = np.minimum(np.minimum(arrival[i], arrival[j]), self._horizon_s)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t_star = np.clip(np.where(rv2 > 0, -(px * rvx + py * rvy) / rv2, 0.0), 0.0, limit)
+        closest = np.hypot(px + rvx * t_star, py + rvy * t_star)
+        now_dist = np.hypot(px, py)
+
+        radius = self._proximity_radius_m
+        hit = (closest < radius) & (now_dist >= radius) & (t_star > 0)
+        scores = 1.0 - t_star[hit] / self._horizon_s
+        for a, b, t, d, score in zip(i[hit], j[hit], t_star[hit], closest[hit], scores):
+            uid_a, uid_b = ids[a], ids[b]
+            signals.converging_pairs.append((uid_a, uid_b, round(float(t), 1), round(float(d), 1)))
+            score = round(float(score), 4)
+            signals.proximity[uid_a] = max(signals.proximity.get(uid_a, 0.0), score)
+            signals.proximity[uid_b] = max(signals.proximity.get(uid_b, 0.0), score)
+
+    # ------------------------------------------------------------------
+    # Route deviation
+    # ------------------------------------------------------------------
+
+    def _update_routes(self, units: Sequence[UnitRuntimeState]) -> Dict[str, Tuple[float, float, float, float]]:
+        """Record where each route started; routes end when the destination clears."""
+        routes: Dict[str, Tuple[float, float, float, float]] = {}
+        for u in units:
+            if u.destination is None:
+                continue
+            route = self._routes.get(u.unit_id)
+            if route is None or route[2:] != (u.destination.lat, u.destination.lon):
+                route = (u.lat, u.lon, u.destination.lat, u.destination.lon)
+            routes[u.unit_id] = route
+        self._routes = routes
+        return routes
+
+    def _route_deviation(
+        self,
+        units: Sequence[UnitRuntimeState],
+        lat: np.ndarray,
+        lon: np.ndarray,
+        routes: Dict[str, Tuple[float, float, float, float]],
+        signals: PredictionSignals,
+    ) -> None:
+        """Score the cross-track distance of each unit from its assigned route."""
+        rows = [(k, route) for k, u in enumerate(units) if (route := routes.get(u.unit_id)) is not None]
+        if not rows:
+            return
+        index = np.array([k for k, _ in rows])
+        origin_lat, origin_lon, dest_lat, dest_lon = np.array([route for _, route in rows], dtype=float).T
+
+        # Local frame per route, anchored at its origin
+        scale = np.cos(np.radians(origin_lat))
+        bx = EARTH_RADIUS_M * np.radians(dest_lon - origin_lon) * scale
+        by = EARTH_RADIUS_M * np.radians(dest_lat - origin_lat)
+        px = EARTH_RADIUS_M * np.radians(lon[index] - origin_lon) * scale
+        py = EARTH_RADIUS_M * np.radians(lat[index] - origin_lat)
+        length2 = bx * bx + by * by
+        with np.errstate(divide="ignore", invalid="ignore"):
+            along = np.clip(np.where(length2 > 0, (px * bx + py * by) / length2, 0.0), 0.0, 1.0)
+        cross_track = np.hypot(px - along * bx, py - along * by)
+        scores = np.clip((cross_track - ROUTE_CORRIDOR_M) / ROUTE_DEVIATION_SPAN_M, 0.0, 1.0)
+
+        for (k, _), score in zip(rows, scores):
+            if score > 0:
+                signals.route_deviation[units[k].unit_id] = round(float(score), 4)
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _to_metres(lat: np.ndarray, lon: np.ndarray, lon_ref: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Equirectangular projection; accurate over the few-km scales compared here."""
+        dlon = (lon - lon_ref + 180.0) % 360.0 - 180.0
+        return EARTH_RADIUS_M * np.radians(dlon) * np.cos(np.radians(lat)), EARTH_RADIUS_M * np.radians(lat)
+
+    @staticmethod
+    def _bearing(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+        """Vectorized initial bearing in radians, matching ``MovementEngine._bearing``."""
+        phi1, phi2 = np.radians(lat1), np.radians(lat2)
+        dlam = np.radians(lon2 - lon1)
+        x = np.sin(dlam) * np.cos(phi2)
+        y = np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(dlam)
+        return np.arctan2(x, y)
+
+    @staticmethod
+    def _haversine(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+        phi1, phi2 = np.radians(lat1), np.radians(lat2)
+        dphi = np.radians(lat2 - lat1)
+        dlam = np.radians(lon2 - lon1)
+        a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlam / 2) ** 2
+        return EARTH_RADIUS_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def _neighbour_pairs(x: np.ndarray, y: np.ndarray, radius: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Return index pairs closer than *radius* using a sorted grid hash.
+
+    Each unordered pair is reported once: points are compared with their own
+    cell and four "forward" neighbour cells only.  Lookups are issued in key
+    order so ``searchsorted`` walks the sorted array sequentially.
+    """
+    cx = np.floor(x / radius).astype(np.int64)
+    cy = np.floor(y / radius).astype(np.int64)
+    cy -= cy.min() - 1
+    stride = int(cy.max()) + 2
+    keys = cx * stride + cy
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    positions = np.arange(len(x))
+
+    firsts, seconds = [], []
+    for dx, dy in ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1)):
+        neighbour = sorted_keys + (dx * stride + dy)
+        if dx == 0 and dy == 0:
+            lo = positions + 1  # later points of the same cell only
+        else:
+            lo = np.searchsorted(sorted_keys, neighbour, side="left")
+        counts = np.searchsorted(sorted_keys, neighbour, side="right") - lo
+        counts = np.maximum(counts, 0)
+        total = int(counts.sum())
+        if total == 0:
+            continue
+        a = np.repeat(positions, counts)
+        b = np.repeat(lo - (np.cumsum(counts) - counts), counts) + np.arange(total)
+        firsts.append(order[a])
+        seconds.append(order[b])
+    if not firsts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    i, j = np.concatenate(firsts), np.concatenate(seconds)
+    close = (x[i] - x[j]) ** 2 + (y[i] - y[j]) ** 2 <= radius * radius
+    # Normalise to i < j so the same pair found at different times dedupes
+    return np.minimum(i[close], j[close]), np.maximum(i[close], j[close])
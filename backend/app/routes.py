@@ -2,16 +2,37 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from pydantic import BaseModel, Field
-
-from .models import AlertPayload, Destination, TelemetryUpdateRequest, UnitPublicState, UnitRegistrationRequest, UnitStatus, runtime_to_public
+from typing import AsyncIterator, Iterator, TypeVar
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+
+from .anomaly_engine import AnomalyEngine
+from .models import (
+    AlertPayload,
+    BulkDeregistrationRequest,
+    BulkOperationResult,
+    Destination,
+    TelemetryUpdateRequest,
+    UnitPublicState,
+    UnitRegistrationRequest,
+    UnitStatus,
+    public_to_runtime,
+    runtime_to_public,
+)
 from .state_manager import StateManager
 from .threat_engine import ThreatEngine
 from .websocket_manager import WebsocketManager
 
 router = APIRouter()
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Units per chunk when streaming a fleet export
+EXPORT_CHUNK_UNITS = 1000
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
 
 def get_state_manager(request: Request) -> StateManager:
     return request.app.state.state_manager  # type: ignore[attr-defined]
@@ -25,15 +46,73 @@ def get_threat_engine(request: Request) -> ThreatEngine:
     return request.app.state.threat_engine  # type: ignore[attr-defined]
 
 
+def get_anomaly_engine(request: Request) -> AnomalyEngine:
+    return request.app.state.anomaly_engine  # type: ignore[attr-defined]
+
+
+async def _iter_ndjson(request: Request, model: type[ModelT]) -> AsyncIterator[ModelT]:
+    """Validate a streamed NDJSON body line by line without buffering it whole."""
+    buffer = b""
+    line_no = 0
+
+    def parse(line: bytes) -> ModelT | None:
+        if not line.strip():
+            return None
+        try:
+            return model.model_validate_json(line)
+        except ValidationError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"line {line_no}: {exc.errors()[0]['msg']}",
+            ) from exc
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            item = parse(line)
+            if item is not None:
+                yield item
+    line_no += 1
+    item = parse(buffer)
+    if item is not None:
+        yield item
+
+
+async def _broadcast_state(state_manager: StateManager, websocket_manager: WebsocketManager) -> None:
+    """Push the state after a write, unless the write was queued behind a tick.
+
+    A queued write is not visible yet; the tick broadcasts it after replaying
+    it at commit, so broadcasting now would only re-send the old state.
+    """
+    if state_manager.writes_deferred:
+        return
+    await websocket_manager.broadcast(await state_manager.get_public_state_payload())
+
+
 @router.get("/health")
-async def healthcheck(state_manager: StateManager = Depends(get_state_manager)) -> dict:
-    units = await state_manager.get_public_units()
-    return {"status": "ok", "unit_count": len(units)}
+async def healthcheck(
+    state_manager: StateManager = Depends(get_state_manager),
+    anomaly_engine: AnomalyEngine = Depends(get_anomaly_engine),
+) -> dict:
+    return {
+        "status": "ok",
+        "unit_count": await state_manager.unit_count(),
+        "ml_loaded": anomaly_engine.is_loaded,
+    }
 
 
 @router.get("/units", response_model=list[UnitPublicState])
-async def get_units(state_manager: StateManager = Depends(get_state_manager)) -> list[UnitPublicState]:
-    return await state_manager.get_public_units()
+async def get_units(request: Request, state_manager: StateManager = Depends(get_state_manager)) -> Response:
+    cache = state_manager.public_state()
+    headers = {"ETag": cache.etag}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        if "*" in tags or cache.etag in tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=cache.body, media_type="application/json", headers=headers)
 
 
 @router.get("/alerts", response_model=list[AlertPayload])
@@ -48,7 +127,7 @@ async def register_unit(
     websocket_manager: WebsocketManager = Depends(get_websocket_manager),
 ) -> UnitPublicState:
     state = await state_manager.register_unit(payload)
-    await websocket_manager.broadcast(await state_manager.get_public_state_payload())
+    await _broadcast_state(state_manager, websocket_manager)
     return runtime_to_public(state)
 
 
@@ -69,11 +148,12 @@ async def assign_destination(
                 unit_id=payload.unit_id,
                 destination=payload.destination,
                 status=UnitStatus.active,
-            )
+            ),
+            contact=False,
         )
     except KeyError as exc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
-    await websocket_manager.broadcast(await state_manager.get_public_state_payload())
+    await _broadcast_state(state_manager, websocket_manager)
     return runtime_to_public(state)
 
 
@@ -87,5 +167,56 @@ async def update_telemetry(
         state = await state_manager.update_from_telemetry(payload)
     except KeyError as exc:  # pragma: no cover - FastAPI handles messaging
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
-    await websocket_manager.broadcast(await state_manager.get_public_state_payload())
+    await _broadcast_state(state_manager, websocket_manager)
     return runtime_to_public(state)
+
+
+@router.post("/units/bulk-register", response_model=BulkOperationResult, status_code=status.HTTP_201_CREATED)
+async def bulk_register_units(
+    request: Request,
+    state_manager: StateManager = Depends(get_state_manager),
+    websocket_manager: WebsocketManager = Depends(get_websocket_manager),
+) -> BulkOperationResult:
+    """Register every unit in an NDJSON body of ``UnitRegistrationRequest`` lines."""
+    payloads = [payload async for payload in _iter_ndjson(request, UnitRegistrationRequest)]
+    count = await state_manager.register_units(payloads)
+    await _broadcast_state(state_manager, websocket_manager)
+    return BulkOperationResult(count=count, version=state_manager.version)
+
+
+@router.post("/units/bulk-deregister", response_model=BulkOperationResult)
+async def bulk_deregister_units(
+    payload: BulkDeregistrationRequest,
+    state_manager: StateManager = Depends(get_state_manager),
+    websocket_manager: WebsocketManager = Depends(get_websocket_manager),
+) -> BulkOperationResult:
+    removed = await state_manager.deregister_units(payload.unit_ids)
+    await _broadcast_state(state_manager, websocket_manager)
+    return BulkOperationResult(count=len(removed), version=state_manager.version)
+
+
+@router.get("/fleet/export")
+async def export_fleet(state_manager: StateManager = Depends(get_state_manager)) -> StreamingResponse:
+    """Stream the fleet as NDJSON, one ``UnitPublicState`` per line."""
+    cache = state_manager.public_state()
+
+    def chunks() -> Iterator[str]:
+        fragments = cache.fragments
+        for start in range(0, len(fragments), EXPORT_CHUNK_UNITS):
+            yield "\n".join(fragments[start : start + EXPORT_CHUNK_UNITS]) + "\n"
+
+    return StreamingResponse(chunks(), media_type=NDJSON_MEDIA_TYPE, headers={"ETag": cache.etag})
+
+
+@router.post("/fleet/import", response_model=BulkOperationResult)
+async def import_fleet(
+    request: Request,
+    replace: bool = False,
+    state_manager: StateManager = Depends(get_state_manager),
+    websocket_manager: WebsocketManager = Depends(get_websocket_manager),
+) -> BulkOperationResult:
+    """Load an NDJSON export; ``?replace=true`` drops units missing from it."""
+    states = [public_to_runtime(unit) async for unit in _iter_ndjson(request, UnitPublicState)]
+    await state_manager.import_units(states, replace=replace)
+    await _broadcast_state(state_manager, websocket_manager)
+    return BulkOperationResult(count=len(states), version=state_manager.version)
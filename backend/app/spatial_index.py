@@ -0,0 +1,99 @@
+"""Grid spatial index and level-of-detail aggregation for map viewports."""
+
+from __future__ import annotations
+
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from .models import ViewportSubscription
+
+# Cell size of the broadcast index (~5.5 km at the equator)
+INDEX_CELL_DEG = 0.05
+# Below this zoom level dense areas are aggregated into clusters
+CLUSTER_MAX_ZOOM = 13
+# Only aggregate when the viewport holds more units than this
+CLUSTER_MIN_UNITS = 250
+# Side length of a cluster cell on screen, in pixels of a 256 px tile
+CLUSTER_CELL_PX = 64
+
+Cell = Tuple[int, int]
+
+
+class GridIndex:
+    """Buckets public unit payloads into fixed lat/lon cells for bbox queries."""
+
+    def __init__(self, units: Iterable[dict], cell_deg: float = INDEX_CELL_DEG) -> None:
+        self._cell_deg = cell_deg
+        self._cells: Dict[Cell, List[dict]] = defaultdict(list)
+        for unit in units:
+            self._cells[self._cell_of(unit["lat"], unit["lon"])].append(unit)
+
+    def query(self, viewport: ViewportSubscription) -> List[dict]:
+        """Return every unit inside *viewport* (antimeridian-crossing aware)."""
+        if viewport.west <= viewport.east:
+            spans = [(viewport.west, viewport.east)]
+        else:
+            spans = [(viewport.west, 180.0), (-180.0, viewport.east)]
+
+        result: List[dict] = []
+        for west, east in spans:
+            row_lo, col_lo = self._cell_of(viewport.south, west)
+            row_hi, col_hi = self._cell_of(viewport.north, east)
+            span_cells = (row_hi - row_lo + 1) * (col_hi - col_lo + 1)
+            if span_cells > len(self._cells):
+                # Huge viewport: walking occupied cells is cheaper than the span
+                candidates = (
+                    units
+                    for (row, col), units in self._cells.items()
+                    if row_lo <= row <= row_hi and col_lo <= col <= col_hi
+                )
+            else:
+                candidates = (
+                    self._cells[(row, col)]
+                    for row in range(row_lo, row_hi + 1)
+                    for col in range(col_lo, col_hi + 1)
+                    if (row, col) in self._cells
+                )
+            for units in candidates:
+                result.extend(
+                    u
+                    for u in units
+                    if viewport.south <= u["lat"] <= viewport.north and west <= u["lon"] <= east
+                )
+        return result
+
+    def _cell_of(self, lat: float, lon: float) -> Cell:
+        return (math.floor(lat / self._cell_deg), math.floor(lon / self._cell_deg))
+
+
+def level_of_detail(units: List[dict], zoom: int) -> Tuple[List[dict], List[dict]]:
+    """Split visible units into (individual units, clusters) for *zoom*.
+
+    Clusters carry the member count and the highest risk score in their grid
+    cell so the dashboard can still highlight hot spots without rendering
+    every marker.
+    """
+    if zoom >= CLUSTER_MAX_ZOOM or len(units) <= CLUSTER_MIN_UNITS:
+        return units, []
+
+    cell_deg = 360.0 / (2 ** zoom) * (CLUSTER_CELL_PX / 256)
+    cells: Dict[Cell, List[dict]] = defaultdict(list)
+    for unit in units:
+        cells[(math.floor(unit["lat"] / cell_deg), math.floor(unit["lon"] / cell_deg))].append(unit)
+
+    singles: List[dict] = []
+    clusters: List[dict] = []
+    for members in cells.values():
+        if len(members) == 1:
+            singles.append(members[0])
+            continue
+        clusters.append(
+            {
+                "lat": round(sum(u["lat"] for u in members) / len(members), 6),
+                "lon": round(sum(u["lon"] for u in members) / len(members), 6),
+                "count": len(members),
+                "max_risk": max(u["risk_score"] for u in members),
+            }
+        )
+    return singles, clusters
@@ -0,0 +1,48 @@
+"""Detects units that have stopped reporting, in O(expired) per check."""
+
+from __future__ import annotations
+
+import heapq
+from typing import Dict, List, Tuple
+
+
+class StalenessDetector:
+    """Min-heap of contact deadlines keyed on each unit's last contact.
+
+    Touching a unit only updates its deadline in a dict; the heap entry is
+    rescheduled lazily when it surfaces.  A check therefore pops just the
+    entries whose deadline passed, instead of scanning the whole fleet.
+    """
+
+    def __init__(self, timeout_s: float) -> None:
+        self._timeout_s = timeout_s
+        self._deadlines: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+
+    @property
+    def timeout_s(self) -> float:
+        return self._timeout_s
+
+    def touch(self, unit_id: str, at: float) -> None:
+        """Record contact with *unit_id* at epoch seconds *at*."""
+        if unit_id not in self._deadlines:
+            heapq.heappush(self._heap, (at + self._timeout_s, unit_id))
+        self._deadlines[unit_id] = at + self._timeout_s
+
+    def forget(self, unit_id: str) -> None:
+        self._deadlines.pop(unit_id, None)
+
+    def expire(self, now: float) -> List[str]:
+        """Return units silent for longer than the timeout and stop tracking them."""
+        expired: List[str] = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, unit_id = heapq.heappop(self._heap)
+            current = self._deadlines.get(unit_id)
+            if current is None:
+                continue  # forgotten, or a duplicate of an entry already expired
+            if current > deadline:
+                heapq.heappush(self._heap, (current, unit_id))  # touched since
+                continue
+            del self._deadlines[unit_id]
+            expired.append(unit_id)
+        return expired
@@ -1,9 +1,26 @@
-"""Centralized in-memory state store for all registered units."""
+"""Centralized in-memory state store for all registered units.
+
+Concurrency model: the store has a single writer at a time and lock-free
+readers.  Every mutation is applied synchronously on the event loop and
+replaces the affected ``UnitRuntimeState`` object instead of mutating it, so
+published states are never changed after the fact.  Readers receive an
+immutable ``StateGeneration`` that is republished lazily whenever the version
+moves.
+
+While the movement engine owns the state for a tick (``begin_tick`` →
+``commit_tick``), ingest does not touch the authoritative map: each write is
+queued and replayed on top of the tick's results at commit, so telemetry
+that lands mid-tick is never clobbered by the tick's stale copy.
+"""
 
 from __future__ import annotations
 
-import asyncio
-from typing import Dict, List, Optional
+import json
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
 
 from .models import (
     TelemetryUpdateRequest,
@@ -12,83 +29,383 @@ from .models import (
     UnitRuntimeState,
     UnitStatus,
     runtime_to_public,
+    runtime_to_public_dict,
     utc_now,
 )
+from .staleness_detector import StalenessDetector
+
+
+@dataclass(frozen=True)
+class StateGeneration:
+    """Immutable, atomically published view of every unit at one version."""
+
+    version: int
+    units: Tuple[UnitRuntimeState, ...]
+
+
+class PublicUnitList(tuple):
+    """Immutable public unit dicts together with their pre-encoded JSON array.
+
+    Being a tuple, the sequence cannot drift from ``encoded`` after
+    construction; consumers that need a different list build their own.
+    The dicts themselves are shared by every payload and must be treated
+    as read-only.
+    """
+
+    def __new__(cls, units: Iterable[dict] = (), encoded: str = "[]") -> "PublicUnitList":
+        self = super().__new__(cls, units)
+        object.__setattr__(self, "_encoded", encoded)
+        return self
+
+    @property
+    def encoded(self) -> str:
+        return self._encoded  # type: ignore[attr-defined]
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+
+@dataclass(frozen=True)
+class PublicStateCache:
+    """Serialized public view of one generation, reused until the version moves."""
+
+    version: int
+    units: PublicUnitList
+    fragments: Tuple[str, ...]
+    body: bytes
+    etag: str
 
 
 class StateManager:
     """Tracks the authoritative operational picture."""
 
-    def __init__(self) -> None:
+    def __init__(self, offline_after_s: Optional[float] = None) -> None:
         self._units: Dict[str, UnitRuntimeState] = {}
-        self._lock = asyncio.Lock()
+        self._version = 0
+        self._published = StateGeneration(version=0, units=())
+        self._tick_in_progress = False
+        # Writes deferred while a tick owns the state, plus their latest preview
+        # (None for a unit a queued write removes)
+        self._pending: Deque[Callable[[], None]] = deque()
+        self._pending_states: Dict[str, Optional[UnitRuntimeState]] = {}
+        # Serialized public state, rebuilt per version from per-unit fragments
+        self._instance_tag = uuid.uuid4().hex[:8]
+        self._public_cache: Optional[PublicStateCache] = None
+        self._public_fragments: Dict[str, Tuple[UnitRuntimeState, dict, str]] = {}
+        # Silence detection; disabled when no offline timeout is configured
+        self._staleness = StalenessDetector(offline_after_s) if offline_after_s else None
+        self._status_before_offline: Dict[str, UnitStatus] = {}
+        # Called with the ids of units once their removal has been applied
+        self._removal_listeners: List[Callable[[List[str]], None]] = []
+
+    def add_removal_listener(self, listener: Callable[[List[str]], None]) -> None:
+        """Register a callback that releases per-unit state of removed units.
+
+        It runs when the removal is applied, which for a write queued behind a
+        tick is at commit, after the tick has finished scoring the unit.
+        """
+        self._removal_listeners.append(listener)
+
+    # ------------------------------------------------------------------
+    # Ingest
+    # ------------------------------------------------------------------
 
     async def register_unit(self, payload: UnitRegistrationRequest) -> UnitRuntimeState:
-        async with self._lock:
-            state = UnitRuntimeState(
-                unit_id=payload.unit_id,
-                label=payload.label or payload.unit_id,
-                lat=payload.position.lat,
-                lon=payload.position.lon,
-                speed_mps=payload.speed_mps,
-                direction_deg=payload.direction_deg,
-                status=UnitStatus.idle,
-            )
-            self._units[payload.unit_id] = state
-            return state.clone()
-
-    async def update_from_telemetry(self, payload: TelemetryUpdateRequest) -> UnitRuntimeState:
-        async with self._lock:
-            if payload.unit_id not in self._units:
-                raise KeyError(f"Unit {payload.unit_id} is not registered")
-            state = self._units[payload.unit_id]
-            if payload.position is not None:
-                state.lat = payload.position.lat
-                state.lon = payload.position.lon
-            if payload.speed_mps is not None:
-                state.speed_mps = payload.speed_mps
-            if payload.direction_deg is not None:
-                state.direction_deg = payload.direction_deg
-            if payload.status is not None:
-                state.status = payload.status
-            if payload.destination is not None:
-                state.destination = payload.destination
-            state.last_update = utc_now()
-            return state.clone()
+        state = self._new_unit(payload, utc_now())
+        self._touch(state.unit_id, state.last_update)
+        self._write([state], lambda: self._store(state))
+        return state.clone()
+
+    async def update_from_telemetry(self, payload: TelemetryUpdateRequest, contact: bool = True) -> UnitRuntimeState:
+        """Apply a telemetry patch.
+
+        *contact* marks the update as coming from the unit itself (as opposed
+        to a command issued about it), which resets its silence timer and
+        brings an offline unit back to the status it had before.  A command
+        cannot bring an offline unit back; the status it sets is the one the
+        unit resumes when it next reports.
+        """
+        now = utc_now()
+        current = self._require(payload.unit_id)
+        if contact:
+            self._touch(payload.unit_id, now)
+            restored = self._status_before_offline.pop(payload.unit_id, UnitStatus.idle)
+            if current.status == UnitStatus.offline and payload.status is None:
+                payload = payload.model_copy(update={"status": restored})
+        elif current.status == UnitStatus.offline and payload.status is not None:
+            if payload.status != UnitStatus.offline:
+                self._status_before_offline[payload.unit_id] = payload.status
+            payload = payload.model_copy(update={"status": None})
+        preview = self._patched(current, payload, now)
+        self._write([preview], lambda: self._apply_telemetry(payload, now))
+        return preview.clone()
 
     async def set_status(self, unit_id: str, status: UnitStatus) -> UnitRuntimeState:
-        async with self._lock:
-            if unit_id not in self._units:
-                raise KeyError(f"Unit {unit_id} is not registered")
-            self._units[unit_id].status = status
-            self._units[unit_id].last_update = utc_now()
-            return self._units[unit_id].clone()
+        payload = TelemetryUpdateRequest(unit_id=unit_id, status=status)
+        return await self.update_from_telemetry(payload)
 
-    async def snapshot_units(self) -> List[UnitRuntimeState]:
-        async with self._lock:
-            return [state.clone() for state in self._units.values()]
+    # ------------------------------------------------------------------
+    # Bulk operations (each applied as a single version bump)
+    # ------------------------------------------------------------------
+
+    async def register_units(self, payloads: Iterable[UnitRegistrationRequest]) -> int:
+        now = utc_now()
+        states = [self._new_unit(payload, now) for payload in payloads]
+        for state in states:
+            self._touch(state.unit_id, now)
+        self._write(states, lambda: self._store_many(states))
+        return len(states)
+
+    async def deregister_units(self, unit_ids: Iterable[str]) -> List[str]:
+        """Remove units; returns the ids that were registered."""
+        removed = [uid for uid in dict.fromkeys(unit_ids) if self._current(uid) is not None]
+        for uid in removed:
+            self._forget(uid)
+
+        def apply() -> None:
+            for uid in removed:
+                self._units.pop(uid, None)
+            self._version += 1
+            self._notify_removed(removed)
+
+        self._write([], apply, removed)
+        return removed
+
+    async def import_units(self, states: Iterable[UnitRuntimeState], replace: bool = False) -> List[str]:
+        """Load exported unit states; with *replace* the current fleet is dropped.
+
+        Returns the ids of previously registered units that are no longer present.
+        """
+        states = list(states)
+        imported = {state.unit_id for state in states}
+        dropped = [uid for uid in self._unit_ids() if uid not in imported] if replace else []
+        for uid in dropped:
+            self._forget(uid)
+        now = utc_now()
+        for state in states:
+            if state.status != UnitStatus.offline:
+                self._touch(state.unit_id, now)
+
+        def apply() -> None:
+            if replace:
+                self._units.clear()
+            self._store_many(states)
+            self._notify_removed(dropped)
+
+        self._write(states, apply, dropped)
+        return dropped
+
+    async def expire_offline(self) -> List[UnitRuntimeState]:
+        """Mark units silent for longer than the offline timeout as offline.
 
-    async def persist_unit(self, state: UnitRuntimeState) -> UnitRuntimeState:
-        async with self._lock:
-            self._units[state.unit_id] = state.clone()
-            return state.clone()
+        Only the units whose deadline passed are visited; returns their new states.
+        """
+        if self._staleness is None:
+            return []
+        now = utc_now()
+        marked: List[UnitRuntimeState] = []
+        for unit_id in self._staleness.expire(now.timestamp()):
+            state = self._current(unit_id)
+            if state is None or state.status == UnitStatus.offline:
+                continue
+            self._status_before_offline[unit_id] = state.status
+            payload = TelemetryUpdateRequest(unit_id=unit_id, status=UnitStatus.offline)
+            preview = self._patched(state, payload, now)
+            self._write([preview], lambda payload=payload: self._apply_telemetry(payload, now))
+            marked.append(preview.clone())
+        return marked
+
+    # ------------------------------------------------------------------
+    # Tick ownership
+    # ------------------------------------------------------------------
+
+    async def begin_tick(self) -> List[UnitRuntimeState]:
+        """Hand the state to the tick; returns private copies it may mutate."""
+        self._tick_in_progress = True
+        return [state.clone() for state in self._units.values()]
+
+    async def commit_tick(self, updated: Iterable[UnitRuntimeState]) -> bool:
+        """Store the tick's results, then replay ingest queued meanwhile.
+
+        Returns whether any queued writes were replayed, in which case the
+        caller owes clients the broadcast their writers skipped.
+        """
+        replayed = bool(self._pending)
+        try:
+            for state in updated:
+                if state.unit_id in self._units:
+                    self._units[state.unit_id] = state
+                    self._version += 1
+            while self._pending:
+                self._pending.popleft()()
+            return replayed
+        finally:
+            self._pending_states.clear()
+            self._tick_in_progress = False
+
+    # ------------------------------------------------------------------
+    # Lock-free reads
+    # ------------------------------------------------------------------
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def writes_deferred(self) -> bool:
+        """True while a tick owns the state and writes are only queued."""
+        return self._tick_in_progress
+
+    def published(self) -> StateGeneration:
+        """Return the current generation; its states must not be mutated."""
+        if self._published.version != self._version:
+            self._published = StateGeneration(version=self._version, units=tuple(self._units.values()))
+        return self._published
+
+    async def snapshot_units(self) -> List[UnitRuntimeState]:
+        return [state.clone() for state in self.published().units]
 
     async def get_public_units(self) -> List[UnitPublicState]:
-        units = await self.snapshot_units()
-        return [runtime_to_public(unit) for unit in units]
+        return [runtime_to_public(unit) for unit in self.published().units]
 
     async def get_public_state_payload(self, event_type: str = "state_update") -> dict:
         return {
             "type": event_type,
-            "units": [unit.model_dump(mode="json") for unit in await self.get_public_units()],
+            "units": self.public_state().units,
             "timestamp": utc_now().isoformat(),
         }
 
+    def public_state(self) -> PublicStateCache:
+        """Return the serialized public view of the current generation.
+
+        Only units whose state object changed since the previous build are
+        re-serialized; everything else reuses its cached dict and JSON.
+        """
+        generation = self.published()
+        cache = self._public_cache
+        if cache is not None and cache.version == generation.version:
+            return cache
+
+        fragments: Dict[str, Tuple[UnitRuntimeState, dict, str]] = {}
+        dicts: List[dict] = []
+        parts: List[str] = []
+        for state in generation.units:
+            entry = self._public_fragments.get(state.unit_id)
+            if entry is None or entry[0] is not state:
+                data = runtime_to_public_dict(state)
+                entry = (state, data, json.dumps(data, separators=(",", ":")))
+            fragments[state.unit_id] = entry
+            dicts.append(entry[1])
+            parts.append(entry[2])
+        units = PublicUnitList(dicts, "[" + ",".join(parts) + "]")
+
+        self._public_fragments = fragments
+        self._public_cache = PublicStateCache(
+            version=generation.version,
+            units=units,
+            fragments=tuple(parts),
+            body=units.encoded.encode(),
+            etag=f'"{self._instance_tag}-{generation.version}"',
+        )
+        return self._public_cache
+
+    async def unit_count(self) -> int:
+        return len(self._units)
+
     async def get_unit(self, unit_id: str) -> Optional[UnitRuntimeState]:
-        async with self._lock:
-            state = self._units.get(unit_id)
-            return state.clone() if state else None
+        state = self._current(unit_id)
+        return state.clone() if state else None
 
     async def unit_exists(self, unit_id: str) -> bool:
-        async with self._lock:
-            return unit_id in self._units
+        return self._current(unit_id) is not None
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _current(self, unit_id: str) -> Optional[UnitRuntimeState]:
+        """Latest state of a unit, counting writes still queued behind a tick."""
+        if unit_id in self._pending_states:
+            return self._pending_states[unit_id]
+        return self._units.get(unit_id)
+
+    def _unit_ids(self) -> List[str]:
+        """Ids of the fleet as it stands once queued writes are applied."""
+        ids = dict.fromkeys(self._units)
+        ids.update(dict.fromkeys(self._pending_states))
+        return [uid for uid in ids if self._current(uid) is not None]
+
+    def _require(self, unit_id: str) -> UnitRuntimeState:
+        state = self._current(unit_id)
+        if state is None:
+            raise KeyError(f"Unit {unit_id} is not registered")
+        return state
+
+    def _touch(self, unit_id: str, at: datetime) -> None:
+        if self._staleness is not None:
+            self._staleness.touch(unit_id, at.timestamp())
+
+    def _forget(self, unit_id: str) -> None:
+        self._status_before_offline.pop(unit_id, None)
+        if self._staleness is not None:
+            self._staleness.forget(unit_id)
+
+    def _write(
+        self, previews: Iterable[UnitRuntimeState], apply: Callable[[], None], removals: Iterable[str] = ()
+    ) -> None:
+        if self._tick_in_progress:
+            self._pending.append(apply)
+            for uid in removals:
+                self._pending_states[uid] = None
+            for preview in previews:
+                self._pending_states[preview.unit_id] = preview
+        else:
+            apply()
+
+    def _notify_removed(self, unit_ids: List[str]) -> None:
+        if unit_ids:
+            for listener in self._removal_listeners:
+                listener(unit_ids)
+
+    def _store(self, state: UnitRuntimeState) -> None:
+        self._units[state.unit_id] = state
+        self._version += 1
+
+    def _store_many(self, states: Iterable[UnitRuntimeState]) -> None:
+        self._units.update((state.unit_id, state) for state in states)
+        self._version += 1
+
+    @staticmethod
+    def _new_unit(payload: UnitRegistrationRequest, now: datetime) -> UnitRuntimeState:
+        return UnitRuntimeState(
+            unit_id=payload.unit_id,
+            label=payload.label or payload.unit_id,
+            lat=payload.position.lat,
+            lon=payload.position.lon,
+            speed_mps=payload.speed_mps,
+            direction_deg=payload.direction_deg,
+            status=UnitStatus.idle,
+            last_update=now,
+        )
+
+    def _apply_telemetry(self, payload: TelemetryUpdateRequest, now: datetime) -> None:
+        state = self._units.get(payload.unit_id)
+        if state is not None:
+            self._store(self._patched(state, payload, now))
+
+    @staticmethod
+    def _patched(state: UnitRuntimeState, payload: TelemetryUpdateRequest, now: datetime) -> UnitRuntimeState:
+        state = state.clone()
+        if payload.position is not None:
+            state.lat = payload.position.lat
+            state.lon = payload.position.lon
+        if payload.speed_mps is not None:
+            state.speed_mps = payload.speed_mps
+        if payload.direction_deg is not None:
+            state.direction_deg = payload.direction_deg
+        if payload.status is not None:
+            state.status = payload.status
+        if payload.destination is not None:
+            state.destination = payload.destination
+        state.last_update = now
+        return state
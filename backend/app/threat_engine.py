@@ -5,9 +5,10 @@ from __future__ import annotations
 import math
 import uuid
 from collections import defaultdict, deque
-from typing import Dict, List
+from typing import Dict, List, Set
 
 from .models import AlertPayload, UnitRuntimeState, utc_now
+from .prediction_engine import PredictionSignals
 
 # Severity labels
 SEV_LOW = "low"
@@ -15,6 +16,18 @@ SEV_ELEVATED = "elevated"
 SEV_HIGH = "high"
 SEV_CRITICAL = "critical"
 
+# Above this many units going offline in one tick, a single grouped alert is raised
+OFFLINE_ALERT_GROUP_SIZE = 5
+
+# Share of a predictive signal (proximity / route deviation) that can become risk
+PREDICTIVE_RISK_WEIGHT = 0.6
+
+# Predicted-proximity alerts kept active at once, most imminent first
+CONVERGING_ALERT_LIMIT = 50
+
+# Seconds before an alert with the same key may be raised again
+ALERT_COOLDOWN_S = 15.0
+
 
 class ThreatEngine:
     """Combines per-unit anomaly scores with cross-unit correlation to derive
@@ -30,6 +43,8 @@ class ThreatEngine:
         self._active_alerts: Dict[str, AlertPayload] = {}
         # Cooldown tracker so we don't spam identical alerts
         self._alert_cooldowns: Dict[str, float] = {}
+        # Latest batch of trajectory predictions
+        self._predictions = PredictionSignals()
 
     # ------------------------------------------------------------------
     # Per-unit risk scoring
@@ -49,8 +64,15 @@ class ThreatEngine:
 
         # Combined score (70% current, 30% persistence)
         risk = 0.7 * base + 0.3 * persistence
+
+        # Predicted proximity / route deviation can raise, never lower, the risk
+        risk = max(risk, PREDICTIVE_RISK_WEIGHT * self._predictions.unit_signal(state.unit_id))
         return round(min(1.0, risk), 4)
 
+    def apply_predictions(self, signals: PredictionSignals) -> None:
+        """Use *signals* for the following per-unit scoring and correlation."""
+        self._predictions = signals
+
     # ------------------------------------------------------------------
     # Cross-unit correlation & alert generation
     # ------------------------------------------------------------------
@@ -103,6 +125,71 @@ class ThreatEngine:
                 if alert:
                     new_alerts.append(alert)
 
+        # --- Rule 4: Predicted proximity between two units ---
+        # One alert per unit, keyed on the unit, for the most imminent pairs only
+        converging_keys: Set[str] = set()
+        paired: Set[str] = set()
+        for unit_a, unit_b, seconds, closest in sorted(self._predictions.converging_pairs, key=lambda p: p[2]):
+            if len(converging_keys) >= CONVERGING_ALERT_LIMIT:
+                break
+            if unit_a in paired or unit_b in paired:
+                continue
+            paired.update((unit_a, unit_b))
+            key = f"converging_{unit_a}"
+            converging_keys.add(key)
+            alert = self._maybe_alert(
+                key,
+                SEV_ELEVATED,
+                f"Units {unit_a} and {unit_b} predicted within {closest:.0f} m in {seconds:.0f}s",
+                [unit_a, unit_b],
+            )
+            if alert:
+                new_alerts.append(alert)
+        self._clear_stale("converging_", converging_keys)
+
+        # --- Rule 5: Deviation from assigned route ---
+        deviation_keys: Set[str] = set()
+        for unit_id, score in self._predictions.route_deviation.items():
+            if score >= 0.5:
+                key = f"route_deviation_{unit_id}"
+                deviation_keys.add(key)
+                alert = self._maybe_alert(
+                    key,
+                    SEV_HIGH if score >= 0.9 else SEV_ELEVATED,
+                    f"Unit {unit_id} has deviated from its assigned route",
+                    [unit_id],
+                )
+                if alert:
+                    new_alerts.append(alert)
+        self._clear_stale("route_deviation_", deviation_keys)
+
+        self._prune_cooldowns()
+        return new_alerts
+
+    def report_offline(self, units: List[UnitRuntimeState]) -> List[AlertPayload]:
+        """Raise alerts for units that just went silent and were marked offline."""
+        if not units:
+            return []
+        if len(units) > OFFLINE_ALERT_GROUP_SIZE:
+            unit_ids = sorted(u.unit_id for u in units)
+            alert = self._maybe_alert(
+                "offline_group_" + "_".join(unit_ids),
+                SEV_HIGH,
+                f"{len(unit_ids)} units stopped reporting and were marked offline",
+                unit_ids,
+            )
+            return [alert] if alert else []
+
+        new_alerts: List[AlertPayload] = []
+        for u in units:
+            alert = self._maybe_alert(
+                f"offline_{u.unit_id}",
+                SEV_ELEVATED,
+                f"Unit {u.unit_id} stopped reporting and was marked offline",
+                [u.unit_id],
+            )
+            if alert:
+                new_alerts.append(alert)
         return new_alerts
 
     def get_severity(self, risk_score: float) -> str:
@@ -114,6 +201,12 @@ class ThreatEngine:
             return SEV_ELEVATED
         return SEV_LOW
 
+    def forget_unit(self, unit_id: str) -> None:
+        """Drop score history and alerts that concern only *unit_id*."""
+        self._score_history.pop(unit_id, None)
+        for key in [k for k, a in self._active_alerts.items() if a.affected_units == [unit_id]]:
+            del self._active_alerts[key]
+
     @property
     def active_alerts(self) -> List[AlertPayload]:
         return list(self._active_alerts.values())
@@ -126,7 +219,7 @@ class ThreatEngine:
         self, key: str, severity: str, message: str, affected: List[str]
     ) -> AlertPayload | None:
         now = utc_now().timestamp()
-        if key in self._alert_cooldowns and now - self._alert_cooldowns[key] < 15:
+        if key in self._alert_cooldowns and now - self._alert_cooldowns[key] < ALERT_COOLDOWN_S:
             return None  # cooldown active
         alert = AlertPayload(
             alert_id=str(uuid.uuid4())[:8],
@@ -139,6 +232,16 @@ class ThreatEngine:
         self._alert_cooldowns[key] = now
         return alert
 
+    def _clear_stale(self, prefix: str, current: Set[str]) -> None:
+        """Drop active *prefix* alerts whose signal is gone from the latest batch."""
+        for key in [k for k in self._active_alerts if k.startswith(prefix) and k not in current]:
+            del self._active_alerts[key]
+
+    def _prune_cooldowns(self) -> None:
+        now = utc_now().timestamp()
+        for key in [k for k, at in self._alert_cooldowns.items() if now - at >= ALERT_COOLDOWN_S]:
+            del self._alert_cooldowns[key]
+
     @staticmethod
     def _spatial_cluster(
         units: List[UnitRuntimeState], radius_m: float
@@ -3,41 +3,283 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Set
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
 
 from fastapi import WebSocket, WebSocketDisconnect
 
+from .fleet_summary import FleetSummary
+from .models import RosterPage, StreamTopic, SubscriptionRequest, ViewportSubscription
+from .spatial_index import GridIndex, level_of_detail
+from .state_manager import PublicUnitList
+
+# Payload keys delivered under each subscribable topic
+TOPIC_KEYS: Dict[str, tuple] = {
+    "units": ("units", "clusters", "unit_count"),
+    "alerts": ("alerts", "active_alerts"),
+    "ml_status": ("ml_status",),
+    "summary": ("summary",),
+}
+ALWAYS_SENT_KEYS = ("type", "timestamp")
+
+
+@dataclass
+class ClientSubscription:
+    """What a single connected client has asked to receive."""
+
+    viewport: Optional[ViewportSubscription] = None
+    topics: Optional[frozenset[StreamTopic]] = None
+    unit_id: Optional[str] = None
+    max_rate_hz: Optional[float] = None
+    roster: RosterPage = field(default_factory=RosterPage)
+    # Delivery bookkeeping for rate-limited clients
+    last_sent: float = field(default=0.0, repr=False)
+    pending: Optional[dict] = field(default=None, repr=False)
+    flush_task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    def apply(self, request: SubscriptionRequest) -> None:
+        """Merge a subscription message; omitted fields are left as-is.
+
+        A pending coalesced update was filtered for the old subscription and
+        must not land after what is sent under the new one, so it is dropped;
+        the caller follows up with a fresh ``state_init``.  Its new ``alerts``
+        are events the snapshot does not repeat, so those the new subscription
+        still covers stay pending and go out with the next message.
+        """
+        dropped = self.cancel_flush()
+        fields = request.model_fields_set
+        if "viewport" in fields:
+            self.viewport = request.viewport
+        if "topics" in fields:
+            self.topics = frozenset(request.topics) if request.topics is not None else None
+        if "unit_id" in fields:
+            self.unit_id = request.unit_id
+        if "max_rate_hz" in fields:
+            self.max_rate_hz = request.max_rate_hz
+        if "roster" in fields:
+            self.roster = request.roster if request.roster is not None else RosterPage()
+
+        alerts = dropped.get("alerts") if dropped is not None else None
+        if alerts and (self.topics is None or "alerts" in self.topics):
+            if self.unit_id is not None:
+                alerts = [a for a in alerts if self.unit_id in a["affected_units"]]
+            if alerts:
+                self.pending = {"alerts": alerts}
+
+    def cancel_flush(self) -> Optional[dict]:
+        """Stop any scheduled flush and hand back the update it would have sent."""
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        pending, self.pending = self.pending, None
+        return pending
+
+    @property
+    def is_filtered(self) -> bool:
+        return self.viewport is not None or self.topics is not None or self.unit_id is not None
+
 
 class WebsocketManager:
     """Tracks all connected realtime clients and pushes updates."""
 
     def __init__(self) -> None:
-        self._connections: Set[WebSocket] = set()
+        self._connections: Dict[WebSocket, ClientSubscription] = {}
         self._lock = asyncio.Lock()
+        # Called with every broadcast payload, e.g. to fan it out to other workers
+        self._relays: List[Callable[[dict], Awaitable[None]]] = []
 
-    async def connect(self, websocket: WebSocket) -> None:
+    async def connect(self, websocket: WebSocket, request: Optional[SubscriptionRequest] = None) -> None:
         await websocket.accept()
+        subscription = ClientSubscription()
+        if request is not None:
+            subscription.apply(request)
         async with self._lock:
-            self._connections.add(websocket)
+            self._connections[websocket] = subscription
 
     async def disconnect(self, websocket: WebSocket) -> None:
         async with self._lock:
-            self._connections.discard(websocket)
+            subscription = self._connections.pop(websocket, None)
+        if subscription is not None:
+            subscription.cancel_flush()
+
+    async def subscribe(self, websocket: WebSocket, request: SubscriptionRequest) -> None:
+        async with self._lock:
+            subscription = self._connections.get(websocket)
+            if subscription is not None:
+                subscription.apply(request)
+
+    def add_relay(self, relay: Callable[[dict], Awaitable[None]]) -> None:
+        self._relays.append(relay)
 
     async def broadcast(self, payload: dict) -> None:
+        for relay in self._relays:
+            await relay(payload)
         async with self._lock:
-            connections = list(self._connections)
-        for connection in connections:
-            try:
-                await connection.send_json(payload)
-            except WebSocketDisconnect:
-                await self.disconnect(connection)
-            except Exception:
-                await self.disconnect(connection)
+            connections = list(self._connections.items())
+        if not connections:
+            return
+
+        # Encode the unfiltered payload, and build the spatial index and the
+        # fleet summary, at most once
+        encoded: Optional[str] = None
+        index: Optional[GridIndex] = None
+        summary: Optional[FleetSummary] = None
+
+        def get_index() -> GridIndex:
+            nonlocal index
+            if index is None:
+                index = GridIndex(payload["units"])
+            return index
+
+        def get_summary() -> FleetSummary:
+            nonlocal summary
+            if summary is None:
+                summary = FleetSummary(payload["units"])
+            return summary
+
+        for connection, subscription in connections:
+            if subscription.is_filtered:
+                message = self._filter_payload(payload, subscription, get_index, get_summary)
+                if message is None:
+                    continue
+            else:
+                message = payload
+            if subscription.max_rate_hz is not None:
+                await self._send_coalesced(connection, subscription, message)
+                continue
+            # Never let an older coalesced update arrive after this one
+            pending = subscription.cancel_flush()
+            if pending is not None:
+                message = self._merge(pending, message)
+            if message is payload:
+                if encoded is None:
+                    encoded = self._encode(payload)
+                await self._send_text(connection, encoded)
+            else:
+                await self._send_text(connection, self._encode(message))
 
     async def send_personal(self, websocket: WebSocket, payload: dict) -> None:
-        await websocket.send_json(payload)
+        async with self._lock:
+            subscription = self._connections.get(websocket)
+        message: Optional[dict] = payload
+        pending: Optional[dict] = None
+        if subscription is not None:
+            # Fold any coalesced update in now rather than flushing it afterwards
+            pending = subscription.cancel_flush()
+            if subscription.is_filtered:
+                message = self._filter_payload(
+                    payload,
+                    subscription,
+                    lambda: GridIndex(payload["units"]),
+                    lambda: FleetSummary(payload["units"]),
+                )
+        if pending is not None:
+            message = self._merge(pending, message) if message is not None else pending
+        if message is None:
+            return
+        if subscription is not None:
+            subscription.last_sent = time.monotonic()
+        await websocket.send_text(self._encode(message))
 
     async def active_count(self) -> int:
         async with self._lock:
             return len(self._connections)
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    async def _send_text(self, websocket: WebSocket, message: str) -> None:
+        try:
+            await websocket.send_text(message)
+        except WebSocketDisconnect:
+            await self.disconnect(websocket)
+        except Exception:
+            await self.disconnect(websocket)
+
+    async def _send_coalesced(self, websocket: WebSocket, subscription: ClientSubscription, payload: dict) -> None:
+        """Send now if the client's rate allows it, else fold into the pending update."""
+        subscription.pending = self._merge(subscription.pending, payload)
+        if subscription.flush_task is not None:
+            return
+        wait = subscription.last_sent + 1.0 / subscription.max_rate_hz - time.monotonic()
+        if wait <= 0:
+            await self._flush(websocket, subscription)
+        else:
+            subscription.flush_task = asyncio.create_task(self._flush_later(websocket, subscription, wait))
+
+    async def _flush_later(self, websocket: WebSocket, subscription: ClientSubscription, wait: float) -> None:
+        await asyncio.sleep(wait)
+        subscription.flush_task = None
+        await self._flush(websocket, subscription)
+
+    async def _flush(self, websocket: WebSocket, subscription: ClientSubscription) -> None:
+        payload, subscription.pending = subscription.pending, None
+        if payload is None:
+            return
+        subscription.last_sent = time.monotonic()
+        await self._send_text(websocket, self._encode(payload))
+
+    @staticmethod
+    def _merge(pending: Optional[dict], payload: dict) -> dict:
+        """Coalesce two updates: snapshots are replaced, new alerts accumulate."""
+        if pending is None:
+            return payload
+        merged = {**pending, **payload}
+        if "alerts" in pending and "alerts" in payload:
+            seen = {alert["alert_id"] for alert in payload["alerts"]}
+            merged["alerts"] = [a for a in pending["alerts"] if a["alert_id"] not in seen] + payload["alerts"]
+        return merged
+
+    @staticmethod
+    def _filter_payload(
+        payload: dict,
+        subscription: ClientSubscription,
+        get_index: Callable[[], GridIndex],
+        get_summary: Callable[[], FleetSummary],
+    ) -> Optional[dict]:
+        """Narrow a payload to the client's topics, unit and viewport.
+
+        The ``summary`` topic is only sent when asked for by name; it is
+        derived from the payload's units and carries the client's roster page.
+        Returns ``None`` when nothing the client subscribed to is present.
+        """
+        if subscription.topics is None:
+            result = dict(payload)
+        else:
+            result = {key: payload[key] for key in ALWAYS_SENT_KEYS if key in payload}
+            for topic in subscription.topics:
+                for key in TOPIC_KEYS[topic]:
+                    if key in payload:
+                        result[key] = payload[key]
+            if "summary" in subscription.topics and "units" in payload:
+                result["summary"] = get_summary().for_page(subscription.roster)
+            if result.keys() <= set(ALWAYS_SENT_KEYS):
+                return None
+
+        unit_id = subscription.unit_id
+        if unit_id is not None:
+            if "units" in result:
+                result["units"] = [u for u in result["units"] if u["unit_id"] == unit_id]
+                result["unit_count"] = len(payload["units"])
+            for key in TOPIC_KEYS["alerts"]:
+                if key in result:
+                    result[key] = [a for a in result[key] if unit_id in a["affected_units"]]
+        elif subscription.viewport is not None and "units" in result:
+            units, clusters = level_of_detail(get_index().query(subscription.viewport), subscription.viewport.zoom)
+            result["units"] = units
+            result["clusters"] = clusters
+            result["unit_count"] = len(payload["units"])
+        return result
+
+    @staticmethod
+    def _encode(payload: dict) -> str:
+        """Encode *payload*, splicing in a pre-encoded ``units`` array when present."""
+        units = payload.get("units")
+        if not isinstance(units, PublicUnitList):
+            return json.dumps(payload, separators=(",", ":"))
+        rest = json.dumps({k: v for k, v in payload.items() if k != "units"}, separators=(",", ":"))
+        separator = "," if len(rest) > 2 else ""
+        return f'{rest[:-1]}{separator}"units":{units.encoded}}}'
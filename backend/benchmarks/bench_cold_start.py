@@ -0,0 +1,83 @@
+"""Cold-start cost: app import time and time to the first healthy response.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_cold_start --runs 5
+
+Each run starts a fresh interpreter.  "import" is the wall time of
+``import app.main``; "first /api/health" is measured from spawning uvicorn
+until the health endpoint answers 200, and "ml loaded" until it reports the
+ML stack as imported.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import() -> float:
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True)
+    return float(output.stdout.strip())
+
+
+def measure_startup(timeout: float = 30.0) -> tuple[float, float]:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/api/health"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    first_health = ml_loaded = None
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    body = json.load(response)
+            except OSError:
+                time.sleep(0.005)
+                continue
+            now = time.perf_counter() - started
+            first_health = first_health or now
+            if body.get("ml_loaded"):
+                ml_loaded = now
+                break
+            time.sleep(0.005)
+    finally:
+        server.terminate()
+        server.wait()
+    if first_health is None or ml_loaded is None:
+        raise RuntimeError("server did not become healthy in time")
+    return first_health, ml_loaded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    startups = [measure_startup() for _ in range(args.runs)]
+    print(f"import app.main     median={statistics.median(imports) * 1000:7.0f} ms")
+    print(f"first /api/health   median={statistics.median(s[0] for s in startups) * 1000:7.0f} ms")
+    print(f"ml loaded           median={statistics.median(s[1] for s in startups) * 1000:7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""End-to-end timings for loading, exporting and re-importing a large fleet.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_fleet_import --units 100000
+
+Requests go through the real ASGI app in-process (the simulation loop is
+not started), so each timing covers NDJSON parsing, validation, the single
+store transaction and the one full-state broadcast payload build.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def timed(label: str, count: int, call) -> object:
+    started = time.perf_counter()
+    result = call()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<22} {elapsed * 1000:9.1f} ms  ({count / elapsed:>10,.0f} units/s)")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--units", type=int, default=100_000)
+    args = parser.parse_args()
+    count = args.units
+
+    body = "\n".join(
+        json.dumps(
+            {
+                "unit_id": f"unit-{i:06d}",
+                "position": {"lat": 37.0 + random.random(), "lon": -122.0 + random.random()},
+                "speed_mps": random.uniform(0, 10),
+                "direction_deg": random.uniform(0, 359),
+            }
+        )
+        for i in range(count)
+    )
+    ndjson = {"content-type": "application/x-ndjson"}
+    client = TestClient(app)
+
+    timed("bulk-register", count, lambda: client.post("/api/units/bulk-register", content=body, headers=ndjson))
+    export = timed("export", count, lambda: client.get("/api/fleet/export"))
+    timed("import (replace)", count, lambda: client.post("/api/fleet/import?replace=true", content=export.content, headers=ndjson))
+    ids = [f"unit-{i:06d}" for i in range(count)]
+    timed("bulk-deregister", count, lambda: client.post("/api/units/bulk-deregister", json={"unit_ids": ids}))
+    print(f"export size: {len(export.content) / 1024 / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Throughput of the batch trajectory prediction engine.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_prediction --units 1000 10000 100000
+
+Units are spread over a square area sized for a constant density, all
+active, with a fifth of them following an assigned route.  Reports the time
+per batch and the resulting predictions (unit tracks) per second.
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import time
+
+from app.models import Destination, UnitRuntimeState, UnitStatus
+from app.prediction_engine import PredictionEngine
+
+# Units per square kilometre of the synthetic operating area
+DENSITY_PER_KM2 = 2.0
+
+
+def make_fleet(count: int) -> list[UnitRuntimeState]:
+    side_deg = math.sqrt(count / DENSITY_PER_KM2) / 111.0
+    fleet = []
+    for i in range(count):
+        lat = 37.0 + random.random() * side_deg
+        lon = -122.0 + random.random() * side_deg
+        destination = None
+        if i % 5 == 0:
+            destination = Destination(lat=lat + random.uniform(-0.02, 0.02), lon=lon + random.uniform(-0.02, 0.02))
+        fleet.append(
+            UnitRuntimeState(
+                unit_id=f"unit-{i:06d}",
+                lat=lat,
+                lon=lon,
+                speed_mps=random.uniform(0.5, 15.0),
+                direction_deg=random.uniform(0, 359),
+                status=UnitStatus.active,
+                destination=destination,
+            )
+        )
+    return fleet
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--units", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for count in args.units:
+        fleet = make_fleet(count)
+        engine = PredictionEngine()
+        engine.predict(fleet)  # records routes and warms caches
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            signals = engine.predict(fleet)
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        print(
+            f"units={count:>7}  batch={best * 1000:8.1f} ms  "
+            f"predictions/s={count / best:>12,.0f}  converging_pairs={len(signals.converging_pairs)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
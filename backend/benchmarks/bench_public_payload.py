@@ -0,0 +1,66 @@
+"""Cost of building and encoding the public state payload for a large fleet.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_public_payload --units 20000 --changed 0.1
+
+Reports the full rebuild (every unit re-serialized), an incremental rebuild
+after a fraction of units changed, and a cache hit, each followed by the
+JSON encoding a broadcast performs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+
+from app.models import Position, UnitRegistrationRequest
+from app.state_manager import StateManager
+from app.websocket_manager import WebsocketManager
+
+
+async def timed(label: str, state_manager: StateManager) -> None:
+    started = time.perf_counter()
+    payload = await state_manager.get_public_state_payload()
+    built = time.perf_counter()
+    message = WebsocketManager._encode(payload)
+    encoded = time.perf_counter()
+    print(
+        f"{label:<12} build={(built - started) * 1000:8.1f} ms  "
+        f"encode={(encoded - built) * 1000:7.1f} ms  size={len(message) / 1024:.0f} KiB"
+    )
+
+
+async def run(units: int, changed_fraction: float) -> None:
+    state_manager = StateManager()
+    for i in range(units):
+        await state_manager.register_unit(
+            UnitRegistrationRequest(
+                unit_id=f"unit-{i:06d}",
+                position=Position(lat=37.0 + random.random(), lon=-122.0 + random.random()),
+            )
+        )
+    await timed("full", state_manager)
+    await timed("cached", state_manager)
+
+    snapshot = await state_manager.begin_tick()
+    changed = random.sample(snapshot, int(len(snapshot) * changed_fraction))
+    for unit in changed:
+        unit.lat += 0.0001
+    await state_manager.commit_tick(changed)
+    await timed(f"{changed_fraction:.0%} changed", state_manager)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--units", type=int, default=20_000)
+    parser.add_argument("--changed", type=float, default=0.1, help="fraction of units changed between builds")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.units, args.changed))
+
+
+if __name__ == "__main__":
+    main()
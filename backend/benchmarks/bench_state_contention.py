@@ -0,0 +1,94 @@
+"""Ingest latency while the movement engine ticks over a large fleet.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_state_contention --units 20000 --rate 500
+
+A producer issues telemetry updates at a fixed rate while the engine ticks
+continuously.  Latency is measured from the moment an update was due to the
+moment ``update_from_telemetry`` returned, so time spent waiting behind the
+tick shows up directly.  Anomaly scoring is replaced by a constant scorer to
+isolate state-store contention from model cost; pass ``--yield-every`` with a
+value larger than ``--units`` to reproduce a tick that never yields.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from app import movement_engine as movement_module
+from app.models import Position, TelemetryUpdateRequest, UnitRegistrationRequest, UnitStatus
+from app.movement_engine import MovementEngine
+from app.prediction_engine import PredictionEngine
+from app.state_manager import StateManager
+from app.threat_engine import ThreatEngine
+from app.websocket_manager import WebsocketManager
+from stubs import ConstantScorer
+
+
+async def run(units: int, rate: float, duration: float) -> None:
+    state_manager = StateManager()
+    for i in range(units):
+        await state_manager.register_unit(
+            UnitRegistrationRequest(
+                unit_id=f"unit-{i:06d}",
+                position=Position(lat=37.0 + random.random(), lon=-122.0 + random.random()),
+                speed_mps=5.0,
+                direction_deg=random.uniform(0, 359),
+            )
+        )
+        await state_manager.set_status(f"unit-{i:06d}", UnitStatus.active)
+
+    engine = MovementEngine(
+        state_manager, WebsocketManager(), ConstantScorer(), ThreatEngine(), PredictionEngine(), tick_interval=0.0
+    )
+    tick_times: list[float] = []
+
+    async def timed_tick() -> None:
+        while True:
+            started = time.perf_counter()
+            await engine._tick()
+            tick_times.append(time.perf_counter() - started)
+            await asyncio.sleep(0)
+
+    ticker = asyncio.create_task(timed_tick())
+    latencies: list[float] = []
+    interval = 1.0 / rate
+    start = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - start < duration:
+        due = start + sent * interval
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await state_manager.update_from_telemetry(
+            TelemetryUpdateRequest(unit_id=f"unit-{random.randrange(units):06d}", speed_mps=random.uniform(0, 10))
+        )
+        latencies.append(time.perf_counter() - due)
+        sent += 1
+    ticker.cancel()
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000  # noqa: E731
+    print(f"units={units} yield_every={movement_module.TICK_YIELD_EVERY} updates={len(latencies)}")
+    print(f"tick: n={len(tick_times)} mean={statistics.mean(tick_times) * 1000:.1f} ms")
+    print(f"ingest latency ms: p50={pct(0.50):.2f} p95={pct(0.95):.2f} p99={pct(0.99):.2f} max={latencies[-1] * 1000:.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--units", type=int, default=20_000)
+    parser.add_argument("--rate", type=float, default=500.0, help="telemetry updates per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--yield-every", type=int, default=movement_module.TICK_YIELD_EVERY)
+    args = parser.parse_args()
+    movement_module.TICK_YIELD_EVERY = args.yield_every
+    asyncio.run(run(args.units, args.rate, args.duration))
+
+
+if __name__ == "__main__":
+    main()
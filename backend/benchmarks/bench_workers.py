@@ -0,0 +1,175 @@
+"""REST throughput and WebSocket fan-out as uvicorn workers are added.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --units 1000 --clients 500
+
+For each worker count a fresh ``uvicorn --workers N`` is started with
+``CLUSTER_DIR`` set, so one worker owns the state and the rest serve it from
+the shared mirror.  The fleet is bulk-registered through the API (landing on
+any worker), then:
+
+* ``GET /api/units`` and ``GET /api/health`` are hammered for ``--seconds``
+  by ``--procs`` client processes over keep-alive connections, reporting
+  requests/s and latency percentiles (a window that completes no request
+  aborts the run rather than reporting 0 req/s);
+* ``--clients`` WebSocket clients connect (timed until each has its
+  ``state_init``), and a telemetry update is timed until every client has
+  received the broadcast that carries it.
+
+The load generator runs on the same host as the server, so on a machine
+with few cores the gain levels off once clients and workers compete for CPU.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import http.client
+import itertools
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import websockets
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int, cluster_dir: str, timeout: float = 60.0) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env={**os.environ, "CLUSTER_DIR": cluster_dir},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1):
+                # Give the remaining workers time to finish their own startup
+                time.sleep(1.0 + 0.5 * workers)
+                return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("server did not become healthy in time")
+
+
+def load_fleet(port: int, units: int) -> None:
+    body = "\n".join(
+        json.dumps({"unit_id": f"unit-{i:06d}", "position": {"lat": 37.0 + i * 1e-5, "lon": -122.0}}) for i in range(units)
+    ).encode()
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/api/units/bulk-register",
+        data=body,
+        headers={"content-type": "application/x-ndjson"},
+        method="POST",
+    )
+    urllib.request.urlopen(request).read()
+
+
+def _hammer(args: tuple[int, str, float]) -> list[float]:
+    port, path, seconds = args
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        connection.request("GET", path)
+        connection.getresponse().read()
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+    return latencies
+
+
+def http_load(port: int, path: str, procs: int, seconds: float) -> tuple[float, float, float]:
+    """Return (requests/s, p50 and p99 latency in seconds) for *path*."""
+    with multiprocessing.Pool(procs) as pool:
+        latencies = sorted(itertools.chain.from_iterable(pool.map(_hammer, [(port, path, seconds)] * procs)))
+    if not latencies:
+        raise RuntimeError(f"no {path} request completed within {seconds:.0f} s; the server stalled")
+    return len(latencies) / seconds, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+async def websocket_fan_out(port: int, clients: int) -> tuple[float, float, float]:
+    """Return (connect-all seconds, median and max delivery seconds of one update)."""
+    url = f"ws://127.0.0.1:{port}/ws"
+
+    async def connect() -> websockets.WebSocketClientProtocol:
+        ws = await websockets.connect(url, max_size=None)
+        await ws.recv()  # state_init
+        return ws
+
+    started = time.perf_counter()
+    connections = await asyncio.gather(*(connect() for _ in range(clients)))
+    connect_s = time.perf_counter() - started
+
+    marker = 7.25
+    delivered: list[float] = []
+
+    async def wait_for_marker(ws: websockets.WebSocketClientProtocol) -> None:
+        while True:
+            message = json.loads(await ws.recv())
+            if any(unit["speed_mps"] == marker for unit in message.get("units", ())):
+                delivered.append(time.perf_counter() - sent)
+                return
+
+    waiters = [asyncio.create_task(wait_for_marker(ws)) for ws in connections]
+    telemetry = json.dumps({"unit_id": "unit-000000", "speed_mps": marker}).encode()
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/api/update-telemetry",
+        data=telemetry,
+        headers={"content-type": "application/json"},
+        method="POST",
+    )
+    sent = time.perf_counter()
+    await asyncio.to_thread(lambda: urllib.request.urlopen(request).read())
+    await asyncio.wait_for(asyncio.gather(*waiters), timeout=60)
+    await asyncio.gather(*(ws.close() for ws in connections))
+    return connect_s, statistics.median(delivered), max(delivered)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--units", type=int, default=1_000)
+    parser.add_argument("--clients", type=int, default=500, help="WebSocket clients")
+    parser.add_argument("--procs", type=int, default=os.cpu_count() or 1, help="HTTP load generator processes")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"cpus={os.cpu_count()}  units={args.units}  ws clients={args.clients}  http procs={args.procs}")
+    for workers in args.workers:
+        port = free_port()
+        with tempfile.TemporaryDirectory() as cluster_dir:
+            server = start_server(port, workers, cluster_dir)
+            try:
+                load_fleet(port, args.units)
+                time.sleep(0.5)
+                units_rps, units_p50, units_p99 = http_load(port, "/api/units", args.procs, args.seconds)
+                health_rps, health_p50, health_p99 = http_load(port, "/api/health", args.procs, args.seconds)
+                connect_s, median_s, max_s = asyncio.run(websocket_fan_out(port, args.clients))
+            finally:
+                server.terminate()
+                server.wait()
+        print(
+            f"workers={workers}  /api/units={units_rps:8,.0f} req/s (p50 {units_p50 * 1000:.1f} / p99 {units_p99 * 1000:.1f} ms)  "
+            f"/api/health={health_rps:8,.0f} req/s (p50 {health_p50 * 1000:.1f} / p99 {health_p99 * 1000:.1f} ms)  "
+            f"ws connect={connect_s * 1000:7.0f} ms  fan-out p50={median_s * 1000:6.0f} ms  max={max_s * 1000:6.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+"""Runs every correctness check in turn: ``python -m checks`` from ``backend/``."""
+
+from __future__ import annotations
+
+from . import check_offline_flow, check_tick_replay, check_update_order
+
+for check_module in (check_tick_replay, check_update_order, check_offline_flow):
+    print(f"== {check_module.__name__.rsplit('.', 1)[-1]}")
+    check_module.main()
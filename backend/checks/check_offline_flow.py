@@ -0,0 +1,115 @@
+"""Checks marking silent units offline and bringing them back.
+
+Run from ``backend/``::
+
+    python -m checks.check_offline_flow
+
+Units are registered with a short offline timeout and the movement engine is
+ticked by hand while some of them stay silent.  The script checks that:
+
+* the staleness detector reschedules touched units and skips forgotten ones;
+* silent units go offline, with one grouped alert for many and one alert
+  per unit otherwise;
+* telemetry from an offline unit restores the status it had;
+* a command about an offline unit leaves it offline, and the status it set
+  is the one the unit resumes when it next reports;
+* a unit that came back goes offline again when it falls silent again.
+
+Exits non-zero on the first failed check.
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+from app.models import Destination, Position, TelemetryUpdateRequest, UnitRegistrationRequest, UnitStatus
+from app.movement_engine import MovementEngine
+from app.prediction_engine import PredictionEngine
+from app.staleness_detector import StalenessDetector
+from app.state_manager import StateManager
+from app.threat_engine import ThreatEngine
+from app.websocket_manager import WebsocketManager
+from stubs import ConstantScorer
+
+from .support import check
+
+TIMEOUT_S = 0.3
+
+
+def check_detector() -> None:
+    detector = StalenessDetector(10)
+    for at in range(5):
+        detector.touch("kept", at)
+    detector.touch("gone", 0)
+    detector.forget("gone")
+    detector.touch("back", 3)
+    check(detector.expire(10.5) == [], "a unit touched since its first deadline is rescheduled")
+    check(detector.expire(13) == ["back"], "units expire at their latest deadline")
+    check(detector.expire(100) == ["kept"], "a forgotten unit is not reported")
+
+
+async def run() -> None:
+    check_detector()
+
+    state_manager = StateManager(offline_after_s=TIMEOUT_S)
+    websocket_manager = WebsocketManager()
+    alerts: list[str] = []
+
+    async def record(payload: dict) -> None:
+        alerts.extend(alert["message"] for alert in payload.get("alerts", ()))
+
+    websocket_manager.add_relay(record)
+    engine = MovementEngine(state_manager, websocket_manager, ConstantScorer(), ThreatEngine(), PredictionEngine())
+
+    async def status(unit_id: str) -> UnitStatus:
+        return (await state_manager.get_unit(unit_id)).status
+
+    ids = [f"unit-{i}" for i in range(8)]
+    for unit_id in ids:
+        await state_manager.register_unit(UnitRegistrationRequest(unit_id=unit_id, position=Position(lat=37.0, lon=-122.0)))
+        await state_manager.set_status(unit_id, UnitStatus.active)
+    await state_manager.set_status("unit-1", UnitStatus.paused)
+
+    await asyncio.sleep(TIMEOUT_S * 0.6)
+    await state_manager.update_from_telemetry(TelemetryUpdateRequest(unit_id="unit-0", speed_mps=2.0))
+    await asyncio.sleep(TIMEOUT_S * 0.6)
+    await engine._tick()
+    check(await status("unit-0") == UnitStatus.active, "a unit that reported stays online")
+    check(
+        all([await status(unit_id) == UnitStatus.offline for unit_id in ids[1:]]),
+        "silent units are marked offline",
+    )
+    check(alerts == ["7 units stopped reporting and were marked offline"], "one grouped alert for many units")
+
+    await asyncio.sleep(TIMEOUT_S * 1.2)
+    await engine._tick()
+    check(await status("unit-0") == UnitStatus.offline, "the reporting unit goes offline once it falls silent")
+    check(alerts[-1] == "Unit unit-0 stopped reporting and was marked offline", "a single unit gets its own alert")
+
+    await state_manager.update_from_telemetry(TelemetryUpdateRequest(unit_id="unit-1", speed_mps=1.0))
+    check(await status("unit-1") == UnitStatus.paused, "telemetry restores the status a unit had before going offline")
+
+    destination = Destination(lat=37.01, lon=-122.0)
+    command = TelemetryUpdateRequest(unit_id="unit-2", destination=destination, status=UnitStatus.active)
+    commanded = await state_manager.update_from_telemetry(command, contact=False)
+    check(commanded.status == UnitStatus.offline, "a command leaves an offline unit offline")
+    check(commanded.destination == destination, "the command's destination is applied at once")
+    await asyncio.sleep(TIMEOUT_S * 1.2)
+    await engine._tick()
+    check(await status("unit-2") == UnitStatus.offline, "the unit stays offline while it is silent")
+
+    reported = await state_manager.update_from_telemetry(TelemetryUpdateRequest(unit_id="unit-2", speed_mps=3.0))
+    check(reported.status == UnitStatus.active, "the unit resumes the commanded status when it reports")
+    check(reported.destination == destination, "and keeps the commanded destination")
+
+    await asyncio.sleep(TIMEOUT_S * 1.2)
+    await engine._tick()
+    check(await status("unit-2") == UnitStatus.offline, "a unit that came back goes offline again when silent")
+
+
+def main() -> None:
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
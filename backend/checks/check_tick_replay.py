@@ -0,0 +1,102 @@
+"""Checks that ingest issued mid-tick survives the tick's commit.
+
+Run from ``backend/``::
+
+    python -m checks.check_tick_replay
+
+A tick is started over an active fleet.  Once it has yielded, telemetry, a
+registration and a deregistration are issued while the state manager only
+queues writes.  The script then checks:
+
+* what reads report while the writes are queued;
+* the state after the commit replays them;
+* that the engines kept no state for the removed unit;
+* that the tick's own broadcast carries the writes.
+
+Exits non-zero on the first failed check.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+
+from app.models import Position, TelemetryUpdateRequest, UnitRegistrationRequest, UnitStatus
+from app.movement_engine import MovementEngine
+from app.prediction_engine import PredictionEngine
+from app.state_manager import StateManager
+from app.threat_engine import ThreatEngine
+from app.websocket_manager import WebsocketManager
+from stubs import ConstantScorer
+
+from .support import check
+
+
+async def run(units: int) -> None:
+    state_manager = StateManager()
+    await state_manager.register_units(
+        UnitRegistrationRequest(
+            unit_id=f"unit-{i:06d}",
+            position=Position(lat=37.0 + i * 1e-4, lon=-122.0),
+            speed_mps=5.0,
+            direction_deg=90.0,
+        )
+        for i in range(units)
+    )
+    for i in range(units):
+        await state_manager.set_status(f"unit-{i:06d}", UnitStatus.active)
+
+    websocket_manager = WebsocketManager()
+    broadcasts: list[dict] = []
+
+    async def record(payload: dict) -> None:
+        broadcasts.append(payload)
+
+    websocket_manager.add_relay(record)
+    threat_engine = ThreatEngine()
+    engine = MovementEngine(state_manager, websocket_manager, ConstantScorer(), threat_engine, PredictionEngine())
+
+    first, last, removed = "unit-000000", f"unit-{units - 1:06d}", f"unit-{units // 2:06d}"
+    tick = asyncio.create_task(engine._tick())
+    while not state_manager.writes_deferred:
+        await asyncio.sleep(0)
+
+    # The tick has already moved `first` and has yet to reach `last`
+    await state_manager.update_from_telemetry(TelemetryUpdateRequest(unit_id=first, speed_mps=9.5))
+    await state_manager.update_from_telemetry(TelemetryUpdateRequest(unit_id=last, speed_mps=7.5))
+    await state_manager.register_unit(UnitRegistrationRequest(unit_id="late-unit", position=Position(lat=37.5, lon=-122.5)))
+    await state_manager.deregister_units([removed])
+    check(state_manager.writes_deferred, "writes issued after the tick yielded were queued")
+
+    first_state = await state_manager.get_unit(first)
+    check(first_state is not None and first_state.speed_mps == 9.5, "queued telemetry is visible to reads")
+    check(await state_manager.unit_exists("late-unit"), "queued registration is visible to reads")
+    check(
+        not await state_manager.unit_exists(removed) and await state_manager.get_unit(removed) is None,
+        "queued deregistration is visible to reads",
+    )
+
+    await tick
+    check(not state_manager.writes_deferred, "commit released the state")
+    final = {state.unit_id: state for state in state_manager.published().units}
+    check(final[first].speed_mps == 9.5, "telemetry for a unit the tick had already moved survived")
+    check(final[last].speed_mps == 7.5, "telemetry for a unit the tick moved afterwards survived")
+    check(final[last].lon != -122.0, "the tick's own motion for that unit was kept")
+    check("late-unit" in final, "mid-tick registration survived")
+    check(removed not in final, "mid-tick deregistration survived")
+    check(removed not in threat_engine._score_history, "the engines released the removed unit after scoring it")
+
+    check(len(broadcasts) == 1, "the tick broadcast once after replaying the queued writes")
+    sent = {unit["unit_id"]: unit for unit in broadcasts[-1]["units"]}
+    check(sent[first]["speed_mps"] == 9.5 and "late-unit" in sent and removed not in sent, "the broadcast carries them")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--units", type=int, default=1_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.units))
+
+
+if __name__ == "__main__":
+    main()
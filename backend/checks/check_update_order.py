@@ -0,0 +1,103 @@
+"""Checks that rate-limited clients never get updates out of order or lose alerts.
+
+Run from ``backend/``::
+
+    python -m checks.check_update_order
+
+Broadcasts are sent to recording fake sockets through ``WebsocketManager``.
+Each payload's ``timestamp`` is a sequence number, so the order a client saw
+can be read back.  The script checks that:
+
+* coalesced updates keep the latest snapshot and accumulate new alerts;
+* a pending coalesced update never arrives after a newer message, whether
+  that is a direct broadcast or a personal ``state_init``;
+* new alerts from an update a resubscribe drops reach the client with the
+  next message, narrowed to the new subscription.
+
+Exits non-zero on the first failed check.
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+from app.models import SubscriptionRequest
+from app.websocket_manager import WebsocketManager
+from stubs import FakeWebSocket
+
+from .support import check
+
+# Seconds between deliveries for the rate-limited clients below
+PERIOD_S = 0.2
+
+
+def update(seq: int, *alert_ids: str, unit_id: str = "unit-1") -> dict:
+    payload = {"type": "state_update", "timestamp": seq, "units": []}
+    if alert_ids:
+        payload["alerts"] = [{"alert_id": a, "affected_units": [unit_id]} for a in alert_ids]
+    return payload
+
+
+def seen(socket: FakeWebSocket) -> list:
+    return [message["timestamp"] for message in socket.sent]
+
+
+def alerts(message: dict) -> list:
+    return [alert["alert_id"] for alert in message.get("alerts", ())]
+
+
+async def rate_limited(manager: WebsocketManager) -> FakeWebSocket:
+    socket = FakeWebSocket()
+    await manager.connect(socket, SubscriptionRequest(max_rate_hz=1 / PERIOD_S))
+    await manager.broadcast(update(0))  # sent at once, starting the client's period
+    return socket
+
+
+async def run() -> None:
+    manager = WebsocketManager()
+
+    socket = await rate_limited(manager)
+    await manager.broadcast(update(1, "a"))
+    await manager.broadcast(update(2, "b"))
+    await asyncio.sleep(PERIOD_S * 1.5)
+    check(seen(socket) == [0, 2], "coalesced updates deliver only the latest snapshot")
+    check(alerts(socket.sent[-1]) == ["a", "b"], "coalesced updates accumulate new alerts")
+
+    socket = await rate_limited(manager)
+    await manager.broadcast(update(1, "a"))  # pending
+    await manager.subscribe(socket, SubscriptionRequest.model_validate({"max_rate_hz": None}))
+    await manager.broadcast(update(2))
+    await asyncio.sleep(PERIOD_S * 1.5)
+    check(seen(socket) == [0, 2], "a pending update does not follow the direct broadcast after a resubscribe")
+    check(alerts(socket.sent[-1]) == ["a"], "its new alerts go out with that broadcast")
+
+    socket = await rate_limited(manager)
+    await manager.broadcast(update(1, "a"))  # pending
+    await manager.send_personal(socket, {"type": "state_init", "timestamp": 2, "units": []})
+    await asyncio.sleep(PERIOD_S * 1.5)
+    check(seen(socket) == [0, 2], "a pending update is folded into a personal state_init, not sent after it")
+    check(alerts(socket.sent[-1]) == ["a"], "the state_init carries its new alerts")
+
+    socket = await rate_limited(manager)
+    await manager.broadcast(update(1, "a", unit_id="unit-1"))
+    await manager.broadcast(update(2, "b", unit_id="unit-2"))  # both pending
+    await manager.subscribe(socket, SubscriptionRequest.model_validate({"unit_id": "unit-2"}))
+    await manager.send_personal(socket, {"type": "state_init", "timestamp": 3, "units": []})
+    await asyncio.sleep(PERIOD_S * 1.5)
+    check(seen(socket) == [0, 3], "a resubscribe drops the pending snapshot")
+    check(alerts(socket.sent[-1]) == ["b"], "alerts it dropped reach the client, narrowed to the new unit")
+
+    socket = await rate_limited(manager)
+    await manager.broadcast(update(1, "a"))  # pending
+    await manager.subscribe(socket, SubscriptionRequest.model_validate({"topics": ["units"]}))
+    await manager.send_personal(socket, {"type": "state_init", "timestamp": 2, "units": []})
+    await asyncio.sleep(PERIOD_S * 1.5)
+    check(seen(socket) == [0, 2] and not alerts(socket.sent[-1]), "no alerts once the alerts topic is dropped")
+
+
+def main() -> None:
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
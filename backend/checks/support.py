@@ -0,0 +1,12 @@
+"""Helpers shared by the correctness checks."""
+
+from __future__ import annotations
+
+import sys
+
+
+def check(condition: bool, message: str) -> None:
+    """Print the outcome of one check; exit non-zero on the first failure."""
+    print(f"{'ok  ' if condition else 'FAIL'} {message}")
+    if not condition:
+        sys.exit(1)
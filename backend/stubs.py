@@ -0,0 +1,38 @@
+"""Stand-ins shared by ``benchmarks/`` and ``checks/``.
+
+Both are run from ``backend/`` as modules, which puts this directory on the
+import path.
+"""
+
+from __future__ import annotations
+
+import json
+
+
+class ConstantScorer:
+    """Anomaly engine stand-in so only state and motion work is measured."""
+
+    is_loaded = False
+    is_trained = False
+
+    def score_unit(self, state) -> float:
+        return 0.0
+
+    def score_units(self, states) -> list[float]:
+        return [0.0] * len(states)
+
+    def forget_unit(self, unit_id: str) -> None:
+        pass
+
+
+class FakeWebSocket:
+    """Records what ``WebsocketManager`` sends, decoded, in order."""
+
+    def __init__(self) -> None:
+        self.sent: list[dict] = []
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, message: str) -> None:
+        self.sent.append(json.loads(message))
@@ -7,9 +7,15 @@ import UnitTable from './components/UnitTable.jsx';
 import socket from './services/socket.js';
 
 const API_BASE = 'http://localhost:8000/api';
+// The panels take the server's fleet summary; full units only for the map's viewport
+const PANEL_TOPICS = ['summary', 'alerts', 'ml_status'];
+const ROSTER_PAGE = { offset: 0, limit: 50, sort: 'unit_id', order: 'asc' };
 
 export default function App() {
-  const [units, setUnits] = useState([]);
+  // Fleet-wide counts, risk ranking and roster page; drives the panels and header
+  const [summary, setSummary] = useState(null);
+  // Units and clusters in the map's viewport, once the map has subscribed
+  const [mapView, setMapView] = useState(null);
   const [alerts, setAlerts] = useState([]);
   const [connected, setConnected] = useState(false);
   const [mlStatus, setMlStatus] = useState({});
@@ -17,16 +23,23 @@ export default function App() {
   const [cmdLog, setCmdLog] = useState([]);
 
   useEffect(() => {
+    // Until the map is fitted and has a viewport, no unit stream at all
+    socket.subscribe({ topics: PANEL_TOPICS, roster: ROSTER_PAGE });
     socket.connect();
     const unsub = socket.onMessage((payload) => {
       if (payload.type === 'connected') { setConnected(true); return; }
       if (payload.type === 'disconnected') { setConnected(false); return; }
-      if (payload.units) setUnits(payload.units);
+      if (payload.summary) setSummary(payload.summary);
+      if (payload.units) setMapView({ units: payload.units, clusters: payload.clusters || [] });
       if (payload.active_alerts) setAlerts(payload.active_alerts);
       if (payload.ml_status) setMlStatus(payload.ml_status);
     });
     const clockId = setInterval(() => setClock(nowUTC()), 1000);
-    return () => { unsub(); socket.disconnect(); clearInterval(clockId); };
+    return () => {
+      unsub();
+      socket.disconnect();
+      clearInterval(clockId);
+    };
   }, []);
 
   const addCmdLog = useCallback((msg) => {
@@ -50,6 +63,17 @@ export default function App() {
     }
   }, [addCmdLog]);
 
+  const handleViewportChange = useCallback((viewport) => {
+    socket.subscribe({ viewport, topics: ['units', ...PANEL_TOPICS] });
+  }, []);
+
+  const handleRosterChange = useCallback((roster) => {
+    socket.subscribe({ roster });
+  }, []);
+
+  const unitCount = summary ? summary.unit_count : 0;
+  const activeCount = summary ? summary.status_counts.active : 0;
+
   return (
     <div className="app-root">
       <header className="cmd-header">
@@ -66,8 +90,8 @@ export default function App() {
             {connected ? 'UPLINK ACTIVE' : 'NO UPLINK'}
           </div>
           <div className="header-stats">
-            <span className="stat-item">{'\u25CF'} {units.length} UNITS</span>
-            <span className="stat-item">{'\u25B2'} {units.filter(u => u.status === 'active').length} ACTIVE</span>
+            <span className="stat-item">{'\u25CF'} {unitCount} UNITS</span>
+            <span className="stat-item">{'\u25B2'} {activeCount} ACTIVE</span>
             <span className="stat-item">{alerts.length > 0 ? '\u26A0' : '\u2714'} {alerts.length} ALERTS</span>
           </div>
           <div className="header-clock">{clock}</div>
@@ -79,9 +103,12 @@ export default function App() {
           <div className="map-wrapper">
             <div className="map-label">OPERATIONAL AREA</div>
             <MapView
-              units={units}
+              units={mapView ? mapView.units : []}
+              clusters={mapView ? mapView.clusters : []}
+              fitBounds={summary ? summary.bounds : null}
               alerts={alerts}
               onAssignDestination={handleAssignDestination}
+              onViewportChange={handleViewportChange}
             />
           </div>
 
@@ -99,9 +126,9 @@ export default function App() {
         </div>
 
         <div className="intel-sidebar">
-          <SystemHealth units={units} connected={connected} mlStatus={mlStatus} />
-          <UnitTable units={units} />
-          <RiskOverlay units={units} />
+          <SystemHealth summary={summary} connected={connected} mlStatus={mlStatus} />
+          <UnitTable roster={summary ? summary.roster : null} onRosterChange={handleRosterChange} />
+          <RiskOverlay units={summary ? summary.top_risk : []} />
           <AlertsPanel alerts={alerts} />
         </div>
       </div>
@@ -74,14 +74,48 @@ function popupHTML(u) {
   </div>`;
 }
 
-export default function MapView({ units = [], alerts = [], onAssignDestination }) {
+function makeClusterIcon(cluster) {
+  const color = riskColor(cluster.max_risk);
+  const size = Math.min(48, 22 + Math.round(Math.log10(cluster.count) * 10));
+  return L.divIcon({
+    className: '',
+    html: `<div style="
+      width:${size}px;height:${size}px;
+      display:flex;align-items:center;justify-content:center;
+      font-family:'JetBrains Mono',monospace;font-size:11px;font-weight:700;color:#fff;
+      background:${color}cc;
+      border:2px solid rgba(255,255,255,0.7);
+      border-radius:50%;
+      box-shadow:0 0 8px ${color}80;
+    ">${cluster.count}</div>`,
+    iconSize: [size, size],
+    iconAnchor: [size / 2, size / 2],
+  });
+}
+
+function viewportOf(m) {
+  const b = m.getBounds();
+  const clamp = (v, lim) => Math.max(-lim, Math.min(lim, v));
+  const wrap = (lon) => ((((lon + 180) % 360) + 360) % 360) - 180;
+  const wide = b.getEast() - b.getWest() >= 360;
+  return {
+    south: clamp(b.getSouth(), 90),
+    west: wide ? -180 : wrap(b.getWest()),
+    north: clamp(b.getNorth(), 90),
+    east: wide ? 180 : wrap(b.getEast()),
+    zoom: m.getZoom(),
+  };
+}
+
+export default function MapView({ units = [], clusters = [], fitBounds = null, alerts = [], onAssignDestination, onViewportChange }) {
   const containerRef = useRef(null);
   const mapRef = useRef(null);
   const markersRef = useRef({});
   const trailsRef = useRef({});
   const risksRef = useRef(null);
+  const clustersRef = useRef(null);
   const destMarkersRef = useRef([]);
-  const fittedRef = useRef(false);
+  const [fitted, setFitted] = useState(false);
   const [selectedUnit, setSelectedUnit] = useState(null);
   const [commandMode, setCommandMode] = useState(false);
 
@@ -104,11 +138,44 @@ export default function MapView({ units = [], alerts = [], onAssignDestination }
     L.tileLayer(TILE_URL, { attribution: TILE_ATTR, maxZoom: 19 }).addTo(m);
     L.control.zoom({ position: 'topright' }).addTo(m);
     risksRef.current = L.layerGroup().addTo(m);
+    clustersRef.current = L.layerGroup().addTo(m);
     mapRef.current = m;
     setTimeout(() => m.invalidateSize(), 250);
     return () => { m.remove(); mapRef.current = null; };
   }, []);
 
+  /* Fit once to the whole fleet, from the first summary's bounds */
+  useEffect(() => {
+    const m = mapRef.current;
+    if (!m || fitted || !fitBounds) return;
+    const bounds = L.latLngBounds([fitBounds.south, fitBounds.west], [fitBounds.north, fitBounds.east]);
+    m.fitBounds(bounds.pad(0.4), { maxZoom: 14, animate: false });
+    setFitted(true);
+  }, [fitBounds, fitted]);
+
+  /* Viewport → server-side subscription, only once the map has been fitted */
+  useEffect(() => {
+    const m = mapRef.current;
+    if (!m || !fitted || !onViewportChange) return;
+    const emit = () => onViewportChange(viewportOf(m));
+    emit();
+    m.on('moveend', emit);
+    return () => m.off('moveend', emit);
+  }, [fitted, onViewportChange]);
+
+  /* Aggregated clusters for dense areas at low zoom */
+  useEffect(() => {
+    const layer = clustersRef.current;
+    if (!layer) return;
+    layer.clearLayers();
+    clusters.forEach(c => {
+      L.marker([c.lat, c.lon], { icon: makeClusterIcon(c) })
+        .bindTooltip(`${c.count} units \u2022 max risk ${c.max_risk.toFixed(2)}`)
+        .on('click', () => mapRef.current && mapRef.current.setView([c.lat, c.lon], mapRef.current.getZoom() + 2))
+        .addTo(layer);
+    });
+  }, [clusters]);
+
   /* Map click → assign destination */
   useEffect(() => {
     const m = mapRef.current;
@@ -261,15 +328,6 @@ export default function MapView({ units = [], alerts = [], onAssignDestination }
         }
       }
     }
-
-    // Auto-fit once
-    if (units.length > 0 && !fittedRef.current) {
-      const markers = Object.values(markersRef.current);
-      if (markers.length > 0) {
-        m.fitBounds(L.featureGroup(markers).getBounds().pad(0.4), { maxZoom: 14 });
-        fittedRef.current = true;
-      }
-    }
   }, [units]);
 
   const cancelCommand = useCallback(() => {
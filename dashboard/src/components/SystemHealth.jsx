@@ -1,18 +1,15 @@
 import React from 'react';
 
-export default function SystemHealth({ units = [], connected, mlStatus = {} }) {
-  const activeCount = units.filter(u => u.status === 'active').length;
-  const idleCount = units.filter(u => u.status === 'idle').length;
-  const pausedCount = units.filter(u => u.status === 'paused').length;
-  const offlineCount = units.filter(u => u.status === 'offline').length;
-  const avgRisk = units.length
-    ? units.reduce((s, u) => s + u.risk_score, 0) / units.length
-    : 0;
-  const maxRisk = units.length
-    ? Math.max(...units.map(u => u.risk_score))
-    : 0;
+export default function SystemHealth({ summary, connected, mlStatus = {} }) {
+  const counts = summary ? summary.status_counts : {};
+  const unitCount = summary ? summary.unit_count : 0;
+  const activeCount = counts.active || 0;
+  const idleCount = counts.idle || 0;
+  const pausedCount = counts.paused || 0;
+  const avgRisk = summary ? summary.avg_risk : 0;
+  const maxRisk = summary ? summary.max_risk : 0;
   const riskPct = (avgRisk * 100).toFixed(0);
-  const alertCount = units.filter(u => u.risk_score > 0.55).length;
+  const alertCount = summary ? summary.threat_count : 0;
 
   return (
     <div className="card">
@@ -28,7 +25,7 @@ export default function SystemHealth({ units = [], connected, mlStatus = {} }) {
         <div className="health-item">
           <span className="health-led blue" />
           <div>
-            <div className="health-val">{units.length}</div>
+            <div className="health-val">{unitCount}</div>
             <div className="health-lbl">DEPLOYED</div>
           </div>
         </div>
@@ -42,7 +39,7 @@ export default function SystemHealth({ units = [], connected, mlStatus = {} }) {
         <div className="health-item">
           <span className={`health-led ${mlStatus.trained ? 'green' : 'amber'}`} />
           <div>
-            <div className="health-val">{mlStatus.trained ? 'TRAINED' : 'LEARNING'}</div>
+            <div className="health-val">{mlStatus.trained ? 'TRAINED' : mlStatus.loaded === false ? 'LOADING' : 'LEARNING'}</div>
             <div className="health-lbl">ML MODEL</div>
           </div>
         </div>
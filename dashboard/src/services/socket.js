@@ -6,19 +6,26 @@ class DashboardSocket {
     this.socket = null;
     this.listeners = new Set();
     this.reconnectTimer = null;
+    this.subscription = null;
   }
 
   connect() {
-    if (this.socket && this.socket.readyState === WebSocket.OPEN) return;
+    if (this.socket) return;
 
-    this.socket = new WebSocket(this.url);
+    // The current subscription rides on the URL, so the server never sends
+    // this connection anything it did not ask for (not even state_init)
+    const sent = this.subscription;
+    const ws = new WebSocket(this.url + subscriptionQuery(sent));
+    this.socket = ws;
 
-    this.socket.onopen = () => {
+    ws.onopen = () => {
       console.log('[WS] Connected to backend');
+      if (this.subscription !== sent) this._send(this.subscription);
       this._emit({ type: 'connected' });
     };
 
-    this.socket.onmessage = (event) => {
+    ws.onmessage = (event) => {
+      if (this.socket !== ws) return;
       try {
         const payload = JSON.parse(event.data);
         this._emit(payload);
@@ -27,23 +34,35 @@ class DashboardSocket {
       }
     };
 
-    this.socket.onclose = () => {
+    ws.onclose = () => {
+      if (this.socket !== ws) return; // closed on purpose by disconnect()
       console.log('[WS] Disconnected – reconnecting in 3s');
       this._emit({ type: 'disconnected' });
       this.socket = null;
       this.reconnectTimer = setTimeout(() => this.connect(), 3000);
     };
 
-    this.socket.onerror = (err) => {
+    ws.onerror = (err) => {
       console.warn('[WS] Error', err);
     };
   }
 
   disconnect() {
     clearTimeout(this.reconnectTimer);
-    if (this.socket) {
-      this.socket.close();
-      this.socket = null;
+    const ws = this.socket;
+    this.socket = null;
+    if (ws) ws.close();
+  }
+
+  /* Narrow the stream server-side; carried over to every reconnect. */
+  subscribe(subscription) {
+    this.subscription = { type: 'subscribe', ...this.subscription, ...subscription };
+    this._send(this.subscription);
+  }
+
+  _send(message) {
+    if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+      this.socket.send(JSON.stringify(message));
     }
   }
 
@@ -57,5 +76,21 @@ class DashboardSocket {
   }
 }
 
+function subscriptionQuery(subscription) {
+  if (!subscription) return '';
+  const params = new URLSearchParams();
+  const { viewport, topics, unit_id: unitId, max_rate_hz: maxRateHz, roster } = subscription;
+  if (viewport) {
+    params.set('viewport', [viewport.south, viewport.west, viewport.north, viewport.east, viewport.zoom].join(','));
+  }
+  if (topics) params.set('topics', topics.join(','));
+  if (unitId) params.set('unit_id', unitId);
+  if (maxRateHz) params.set('max_rate_hz', String(maxRateHz));
+  if (roster) params.set('roster', [roster.offset, roster.limit, roster.sort, roster.order].join(','));
+  const query = params.toString();
+  return query ? `?${query}` : '';
+}
+
+/* Single dashboard stream: fleet summary for the panels, viewport units for the map */
 const socket = new DashboardSocket();
 export default socket;